@@ -0,0 +1,230 @@
+"""ASGI serving mode: the core routes on an async SQLAlchemy engine.
+
+Run with e.g. ``uvicorn --factory asgi:create_asgi_app``. Needs starlette and an
+async driver for the configured database (asyncpg for PostgreSQL, aiosqlite for
+SQLite). Settings and the models are shared with the Flask app.
+"""
+import contextlib
+from urllib.parse import parse_qs
+
+from sqlalchemy import event, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import Session
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from catalog_cache import CatalogCache
+from config import Config, engine_options, secret_key
+from history_stats import stat_deltas, stats_upsert_statement, user_history_lock
+from models import Disease, History, Plant, User
+from password_hashing import KdfOverloaded, KdfPool
+from routes import decode_cursor, history_page, history_page_statement, parse_timestamp
+from serialization import encode_payload
+from tokens import TokenError, TokenService
+
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def async_database_url(uri):
+    scheme, separator, rest = uri.partition("://")
+    return ASYNC_DRIVERS.get(scheme, scheme) + separator + rest
+
+
+def create_asgi_app(config=None):
+    settings = {key: getattr(Config, key) for key in dir(Config) if key.isupper()}
+    settings.update(config or {})
+    settings["SECRET_KEY"] = secret_key(settings)
+    database_url = settings.get("ASYNC_DATABASE_URL") or async_database_url(settings["SQLALCHEMY_DATABASE_URI"])
+
+    engine = create_async_engine(database_url, **engine_options(settings))
+    catalog_cache = CatalogCache(ttl=settings["CATALOG_CACHE_TTL"], max_bytes=settings["CATALOG_CACHE_MAX_BYTES"])
+
+    # The model hooks record catalog writes in session.info; this app's sessions turn that into invalidation.
+    class CatalogSession(Session):
+        pass
+
+    @event.listens_for(CatalogSession, "after_commit")
+    def invalidate_catalog_cache(session):
+        if session.info.pop("catalog_changes", None):
+            catalog_cache.invalidate()
+
+    @event.listens_for(CatalogSession, "after_rollback")
+    def discard_catalog_changes(session):
+        session.info.pop("catalog_changes", None)
+
+    @contextlib.asynccontextmanager
+    async def lifespan(app):
+        yield
+        await engine.dispose()
+
+    app = Starlette(routes=[
+        Route("/plants", get_plants, methods=["GET"]),
+        Route("/diseases", get_diseases, methods=["GET"]),
+        Route("/history", get_user_history, methods=["GET"]),
+        Route("/history/create", create_history, methods=["POST"]),
+        Route("/login", login, methods=["POST"]),
+        Route("/users/create", create_user, methods=["POST"]),
+    ], lifespan=lifespan)
+    app.state.config = settings
+    app.state.engine = engine
+    app.state.sessions = async_sessionmaker(engine, expire_on_commit=False, sync_session_class=CatalogSession)
+    app.state.catalog_cache = catalog_cache
+    app.state.kdf_pool = KdfPool(workers=settings["KDF_POOL_SIZE"],
+                                 max_pending=settings["KDF_QUEUE_DEPTH"],
+                                 method=settings["PASSWORD_HASH_METHOD"],
+                                 salt_length=settings["PASSWORD_SALT_LENGTH"],
+                                 timeout=settings["KDF_TIMEOUT"])
+    app.state.token_service = TokenService(settings["SECRET_KEY"],
+                                           access_ttl=settings["ACCESS_TOKEN_TTL"],
+                                           refresh_ttl=settings["REFRESH_TOKEN_TTL"])
+    return app
+
+
+def error_response(e):
+    if isinstance(e, (KdfOverloaded, TimeoutError)):
+        return JSONResponse({"message": "Server busy, try again shortly"}, 503, {"Retry-After": "1"})
+    if isinstance(e, SQLAlchemyError):
+        return JSONResponse({"message": "Database error", "error": str(e)}, 500)
+    return JSONResponse({"message": "An unexpected error occurred", "error": str(e)}, 500)
+
+
+def authenticated_user_id(request):
+    """Return the user id from the Bearer access token, or raise TokenError."""
+    scheme, _, token = request.headers.get("authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise TokenError("Missing access token")
+    return request.app.state.token_service.verify(token)
+
+
+async def catalog_response(request, name, model):
+    cache = request.app.state.catalog_cache
+    entry, version = cache.lookup(name)
+    if entry is None:
+        async with request.app.state.sessions() as session:
+            items = [item.to_dict() for item in await session.scalars(select(model))]
+        # Same encoder as the Flask app, so both modes serve identical bytes and ETags
+        body, mimetype = encode_payload({"message": "success", "data": items}, "json")
+        entry = cache.store(name, body, version, mimetype)
+
+    etag = f'"{entry.etag}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if_none_match = [tag.strip() for tag in request.headers.get("if-none-match", "").split(",")]
+    if etag in if_none_match or f"W/{etag}" in if_none_match or "*" in if_none_match:
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type=entry.mimetype, headers=headers)
+
+
+async def get_plants(request):
+    return await catalog_response(request, "plants", Plant)
+
+
+async def get_diseases(request):
+    return await catalog_response(request, "diseases", Disease)
+
+
+async def get_user_history(request):
+    try:
+        user_id = authenticated_user_id(request)
+    except TokenError as e:
+        return JSONResponse({"message": str(e)}, 401, {"WWW-Authenticate": "Bearer"})
+
+    config = request.app.state.config
+    try:
+        limit = int(request.query_params.get("limit", config["HISTORY_PAGE_SIZE"]))
+        limit = max(1, min(limit, config["HISTORY_MAX_PAGE_SIZE"]))
+        after = request.query_params.get("after")
+        before = request.query_params.get("before")
+        after_date = decode_cursor(after) if after else None
+        before_date = decode_cursor(before) if before else None
+    except ValueError as e:
+        return JSONResponse({"message": "Invalid request", "error": str(e)}, 400)
+
+    try:
+        async with request.app.state.sessions() as session:
+            rows = await session.scalars(history_page_statement(user_id, limit, after_date, before_date))
+        user_history, next_cursor, prev_cursor = history_page(rows, limit, after_date, before_date)
+        return JSONResponse({"message": "success", "data": [history.to_dict() for history in user_history],
+                             "next_cursor": next_cursor, "prev_cursor": prev_cursor})
+    except Exception as e:
+        return error_response(e)
+
+
+async def create_history(request):
+    try:
+        user_id = authenticated_user_id(request)
+    except TokenError as e:
+        return JSONResponse({"message": str(e)}, 401, {"WWW-Authenticate": "Bearer"})
+
+    try:
+        body = await request.json()
+        if body.get("user_id", user_id) != user_id:
+            return JSONResponse({"message": "user_id does not match the authenticated user"}, 403)
+        history = History(user_id=user_id,
+                          predicted_class_id=body["predicted_class_id"],
+                          local_url=body["local_url"],
+                          remote_url=body["remote_url"],
+                          date=parse_timestamp(body["date"]))
+        async with request.app.state.sessions() as session:
+            await session.execute(user_history_lock(session.bind.dialect.name, user_id))
+            session.add(history)
+            await session.execute(stats_upsert_statement(session.bind.dialect.name),
+                                  stat_deltas([{"user_id": user_id, "predicted_class_id": history.predicted_class_id,
+                                                "date": history.date}]))
+            await session.commit()
+        return JSONResponse({"message": "success", "data": [history.to_dict()]})
+    except Exception as e:
+        return error_response(e)
+
+
+async def login(request):
+    try:
+        form = parse_qs((await request.body()).decode())
+        email = form.get("email", [None])[0]
+        password = form.get("password", [None])[0]
+        kdf_pool = request.app.state.kdf_pool
+
+        # The KDF runs with no session open, so waiting logins don't hold pooled connections
+        async with request.app.state.sessions() as session:
+            user = (await session.scalars(select(User).filter_by(email=email))).first()
+        if user is None:
+            return JSONResponse({"message": "Unregistered email"}, 404)
+
+        if user.password is None or not await kdf_pool.verify_async(user.password, password):
+            return JSONResponse({"message": "Wrong password"}, 401)
+
+        if kdf_pool.needs_rehash(user.password):
+            try:
+                new_password_hash = await kdf_pool.hash_async(password)
+                async with request.app.state.sessions() as session:
+                    await session.execute(update(User).where(User.id == user.id).values(password=new_password_hash))
+                    await session.commit()
+            except (KdfOverloaded, TimeoutError):
+                pass
+
+        tokens = request.app.state.token_service.issue(user.id)
+        return JSONResponse({"message": "success", "data": [user.to_public_dict()], **tokens})
+    except Exception as e:
+        return error_response(e)
+
+
+async def create_user(request):
+    try:
+        body = await request.json()
+        async with request.app.state.sessions() as session:
+            if (await session.scalars(select(User.id).filter_by(email=body["email"]))).first() is not None:
+                return JSONResponse({"message": "Email already exists"}, 409)
+
+        # Hashed with no session open, so queued sign-ups don't hold pooled connections
+        password_hash = await request.app.state.kdf_pool.hash_async(body["password"])
+        user = User(first_name=body["first_name"],
+                    last_name=body["last_name"],
+                    email=body["email"],
+                    password=password_hash)
+        async with request.app.state.sessions() as session:
+            session.add(user)
+            await session.commit()
+        return JSONResponse({"message": "success", "data": [user.to_public_dict()]})
+    except Exception as e:
+        return error_response(e)
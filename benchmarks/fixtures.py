@@ -0,0 +1,138 @@
+"""Generated data for the benchmark suite.
+
+Fixtures are deterministic for a given (users, history, seed) and are only
+regenerated when those parameters or the set of tables change, so repeated
+runs reuse the database. The write scenarios' rows are deleted again by
+`discard_writes` after each scenario; the row count of every table is stored
+with the parameters, so a run that died before cleaning up (or any other
+change to the data) regenerates the fixtures instead of skewing the next run.
+"""
+import json
+import random
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import Column, MetaData, String, Table, delete, func, insert, inspect, select
+from sqlalchemy.orm import Session
+from werkzeug.security import generate_password_hash
+
+from history_stats import rebuild_stats, stat_deltas, stats_upsert_statement
+from models import Disease, History, HistoryStat, Plant, User, db
+
+BENCH_PASSWORD = "benchmark-password"
+PLANTS = 3
+CLASSES_PER_PLANT = 10
+CHUNK_SIZE = 50000
+
+WORDS = ("leaf", "leaves", "yellow", "brown", "spots", "lesions", "webbing", "mites", "fungus", "spores",
+         "stem", "fruit", "wilting", "curl", "mosaic", "mottling", "water", "soaked", "margins", "necrotic",
+         "humidity", "rotation", "fungicide", "resistant", "varieties", "debris", "irrigation", "whiteflies",
+         "concentric", "rings", "velvety", "growth", "canker", "blight", "virus", "bacteria", "insect")
+
+fixture_meta = Table("bench_fixture", MetaData(), Column("params", String(), nullable=False))
+
+
+def text(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def row_counts(connection):
+    return {name: connection.execute(select(func.count()).select_from(table)).scalar()
+            for name, table in sorted(db.metadata.tables.items())}
+
+
+def write_prefixes(run_id):
+    """The (history local_url, user email) prefixes of rows written by the run's scenarios."""
+    return f"file:///bench/{run_id}/", f"new{run_id}-"
+
+
+def prefix_range(column, prefix):
+    # A range rather than LIKE, so the unique index on the column is used; "/" + 1 is "0", "-" + 1 is "."
+    return column >= prefix, column < prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def discard_writes(app, run_id):
+    """Delete the history rows and users written by run `run_id` and take them back out of the counters."""
+    local_url_prefix, email_prefix = write_prefixes(run_id)
+    with app.app_context(), db.engine.begin() as connection:
+        written = History.__table__
+        rows = connection.execute(delete(written)
+                                  .where(*prefix_range(written.c.local_url, local_url_prefix))
+                                  .returning(written.c.user_id, written.c.predicted_class_id, written.c.date)).all()
+        deltas = stat_deltas((), rows)
+        if deltas:
+            stats = HistoryStat.__table__
+            connection.execute(stats_upsert_statement(connection.dialect.name), deltas)
+            connection.execute(delete(stats).where(stats.c.count == 0))
+        connection.execute(delete(User.__table__).where(*prefix_range(User.__table__.c.email, email_prefix)))
+
+
+def ensure_fixtures(app, users, history, seed=0, reset=False):
+    """Create (or reuse) a database holding `users` users and `history` history rows.
+
+    Regenerating drops every model table, so a database that has tables but
+    was not made by this function is refused unless `reset` is true.
+    """
+    # The table list is part of the key so a schema change regenerates the fixtures
+    params = {"users": users, "history": history, "seed": seed, "tables": sorted(db.metadata.tables)}
+    with app.app_context():
+        engine = db.engine
+        tables = inspect(engine).get_table_names()
+        existing = None
+        if fixture_meta.name in tables:
+            with engine.connect() as connection:
+                existing = connection.execute(select(fixture_meta.c.params)).scalar()
+                # Counting is only safe once the key says the tables are the ones in db.metadata
+                if existing is not None and json.loads(existing).get("params") == params:
+                    fingerprint = json.dumps({"params": params, "rows": row_counts(connection)}, sort_keys=True)
+                    if existing == fingerprint:
+                        return False
+        if existing is None and tables and not reset:
+            raise RuntimeError(f"{engine.url!r} has tables but no benchmark fixtures; "
+                               "refusing to drop them without --reset-fixtures")
+        fixture_meta.create(engine, checkfirst=True)
+
+        db.drop_all()
+        db.create_all()
+        rng = random.Random(seed)
+        # One shared hash: hashing 100k passwords would dominate fixture generation
+        password = generate_password_hash(BENCH_PASSWORD, app.config["PASSWORD_HASH_METHOD"],
+                                          app.config["PASSWORD_SALT_LENGTH"])
+
+        with engine.begin() as connection:
+            connection.execute(fixture_meta.delete())
+            connection.execute(insert(Plant.__table__), [
+                {"id": plant_id, "name": f"Plant {plant_id}", "image_url": f"https://example.com/plants/{plant_id}.jpg",
+                 "botanical_name": f"Plantae benchmarkii {plant_id}", "general_info": text(rng, 300)}
+                for plant_id in range(1, PLANTS + 1)
+            ])
+            connection.execute(insert(Disease.__table__), [
+                {"name": f"Disease {plant_id}-{class_index}", "class_index": class_index, "plant_id": plant_id,
+                 "botanical_name": f"Pathogen {plant_id}-{class_index}", "image_url": "https://example.com/disease.jpg",
+                 "symptoms": text(rng, 120), "cause": rng.choice(("Fungus", "Virus", "Bacterium", "Insect")),
+                 "propagation": text(rng, 60), "control": text(rng, 80)}
+                for plant_id in range(1, PLANTS + 1) for class_index in range(CLASSES_PER_PLANT)
+            ])
+
+            for start in range(0, users, CHUNK_SIZE):
+                connection.execute(insert(User.__table__), [
+                    {"id": user_id, "first_name": "Bench", "last_name": f"User {user_id}",
+                     "email": f"user{user_id}@bench.test", "password": password}
+                    for user_id in range(start + 1, min(start + CHUNK_SIZE, users) + 1)
+                ])
+
+            # Skewed towards low user ids so a few heavy users own most of the history.
+            # Dates are one second apart, which keeps (user_id, date) unique.
+            base = datetime(2020, 1, 1, tzinfo=timezone.utc)
+            for start in range(0, history, CHUNK_SIZE):
+                connection.execute(insert(History.__table__), [
+                    {"user_id": int(users * rng.random() ** 3) + 1,
+                     "predicted_class_id": rng.randrange(CLASSES_PER_PLANT),
+                     "local_url": f"file:///scans/{i}.jpg", "remote_url": f"https://example.com/scans/{i}.jpg",
+                     "date": base + timedelta(seconds=i)}
+                    for i in range(start, min(start + CHUNK_SIZE, history))
+                ])
+
+            rebuild_stats(Session(bind=connection))
+            connection.execute(insert(fixture_meta), {
+                "params": json.dumps({"params": params, "rows": row_counts(connection)}, sort_keys=True)})
+        return True
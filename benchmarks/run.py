@@ -0,0 +1,258 @@
+"""Load-test every route against generated fixtures and record a JSON baseline.
+
+    python -m benchmarks.run --users 100000 --history 10000000 --output benchmarks/baseline.json
+    python -m benchmarks.run --compare benchmarks/baseline.json --threshold 0.15
+
+The app is served in-process by a threaded werkzeug server and driven over
+HTTP by `--concurrency` client threads. By default it runs against a SQLite
+file; pass --database-url to point it at another database (e.g. a local
+PostgreSQL). Fixture generation drops and recreates the app's tables, so it
+refuses a database with other tables in it unless --reset-fixtures is given.
+Rows the write scenarios add are deleted after each scenario, so every route
+sees the same data on every run.
+Queries-per-request comes from the app's own /metrics. With
+--compare the run fails (exit status 1) if any route's p95/p99 latency or
+queries-per-request grew, or its throughput fell, by more than --threshold.
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import re
+import secrets
+import sys
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+from app import create_app
+from benchmarks.fixtures import BENCH_PASSWORD, CLASSES_PER_PLANT, discard_writes, ensure_fixtures, write_prefixes
+
+DEFAULT_DATABASE_URL = "sqlite:///" + os.path.join(os.path.dirname(os.path.abspath(__file__)), "bench.sqlite")
+SQL_SUM = re.compile(r'^plantdoc_request_sql_statements_(sum|count)\{route="([^"]*)"\} (\S+)$', re.M)
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_request(self, *args, **kwargs):
+        pass
+
+
+class Scenario:
+    def __init__(self, name, route, build):
+        self.name = name
+        self.route = route
+        self.build = build
+
+
+def scenarios(args, run_id, token_for):
+    """Each scenario's `build(rng, n)` returns (method, path, headers, body) for its n-th request.
+
+    Everything the scenarios write is keyed by `run_id` (see `fixtures.write_prefixes`).
+    """
+    counter = itertools.count()
+    local_url_prefix, email_prefix = write_prefixes(run_id)
+
+    def user(rng):
+        return rng.randint(1, args.users)
+
+    def auth(rng):
+        return {"Authorization": "Bearer " + token_for(user(rng))}
+
+    def history_record(n):
+        # Random microsecond timestamps after the fixture range, so writes never collide across runs
+        date = datetime(2030, 1, 1, tzinfo=timezone.utc) + timedelta(microseconds=random.getrandbits(50))
+        return {"predicted_class_id": n % CLASSES_PER_PLANT, "local_url": f"{local_url_prefix}{n}.jpg",
+                "remote_url": "https://example.com/bench.jpg", "date": date.isoformat()}
+
+    def json_body(value):
+        return {"Content-Type": "application/json"}, json.dumps(value).encode()
+
+    def post_json(path, headers, value):
+        extra, body = json_body(value)
+        return "POST", path, {**headers, **extra}, body
+
+    return [
+        Scenario("GET /plants", "/plants", lambda rng, n: ("GET", "/plants", {}, None)),
+        Scenario("GET /diseases", "/diseases", lambda rng, n: ("GET", "/diseases", {}, None)),
+        Scenario("GET /sync snapshot", "/sync", lambda rng, n: ("GET", "/sync", {}, None)),
+        Scenario("GET /diseases/by-class", "/diseases/by-class/<int(signed=True):class_index>",
+                 lambda rng, n: ("GET", f"/diseases/by-class/{rng.randrange(CLASSES_PER_PLANT)}", {}, None)),
+        Scenario("POST /diseases/resolve", "/diseases/resolve",
+                 lambda rng, n: post_json("/diseases/resolve", {},
+                                          {"class_indices": [rng.randrange(CLASSES_PER_PLANT) for _ in range(20)]})),
+        Scenario("GET /history", "/history",
+                 lambda rng, n: ("GET", "/history?limit=50", auth(rng), None)),
+        Scenario("GET /history?expand=disease", "/history",
+                 lambda rng, n: ("GET", "/history?limit=50&expand=disease", auth(rng), None)),
+        Scenario("GET /history/stats", "/history/stats",
+                 lambda rng, n: ("GET", "/history/stats?interval=total", auth(rng), None)),
+        Scenario("GET /history/stats?scope=all", "/history/stats",
+                 lambda rng, n: ("GET", "/history/stats?scope=all&from=2020-01-01&to=2020-01-31", auth(rng), None)),
+        Scenario("POST /history/create", "/history/create",
+                 lambda rng, n: post_json("/history/create", auth(rng), history_record(next(counter)))),
+        Scenario("POST /history/batch", "/history/batch",
+                 lambda rng, n: post_json("/history/batch", auth(rng),
+                                          [history_record(next(counter)) for _ in range(50)])),
+        Scenario("GET /users page", "/users",
+                 lambda rng, n: ("GET", f"/users?limit=100&after_id={user(rng)}", {}, None)),
+        Scenario("POST /login", "/login",
+                 lambda rng, n: ("POST", "/login", {"Content-Type": "application/x-www-form-urlencoded"},
+                                 urllib.parse.urlencode({"email": f"user{user(rng)}@bench.test",
+                                                         "password": BENCH_PASSWORD}).encode())),
+        Scenario("POST /users/create", "/users/create",
+                 lambda rng, n: post_json("/users/create", {},
+                                          {"first_name": "New", "last_name": "User", "password": BENCH_PASSWORD,
+                                           "email": f"{email_prefix}{next(counter)}@bench.test"})),
+    ]
+
+
+def send(base_url, request):
+    method, path, headers, body = request
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(urllib.request.Request(base_url + path, body, headers, method=method)) as response:
+            response.read()
+            ok = response.status < 500
+    except urllib.error.HTTPError as e:
+        e.read()
+        ok = e.code < 500
+    return time.perf_counter() - started, ok
+
+
+def sql_totals(base_url):
+    with urllib.request.urlopen(base_url + "/metrics") as response:
+        text = response.read().decode()
+    totals = {}
+    for kind, route, value in SQL_SUM.findall(text):
+        totals.setdefault(route, {"sum": 0.0, "count": 0.0})[kind] = float(value)
+    return totals
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, round(fraction * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+def run_scenario(base_url, scenario, args):
+    rng = random.Random(f"{args.seed}:{scenario.name}")
+    requests = [scenario.build(rng, n) for n in range(args.warmup + args.requests)]
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        list(pool.map(lambda request: send(base_url, request), requests[:args.warmup]))
+
+        before = sql_totals(base_url).get(scenario.route, {"sum": 0.0, "count": 0.0})
+        started = time.perf_counter()
+        results = list(pool.map(lambda request: send(base_url, request), requests[args.warmup:]))
+        elapsed = time.perf_counter() - started
+        after = sql_totals(base_url).get(scenario.route, {"sum": 0.0, "count": 0.0})
+
+    latencies = sorted(seconds * 1000 for seconds, _ in results)
+    served = after["count"] - before["count"]
+    return {
+        "requests": len(results),
+        "errors": sum(1 for _, ok in results if not ok),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "throughput_rps": round(len(results) / elapsed, 1),
+        "queries_per_request": round((after["sum"] - before["sum"]) / served, 2) if served else None,
+    }
+
+
+def compare(baseline, current, threshold):
+    """Return a list of human-readable regressions of `current` against `baseline`."""
+    regressions = []
+    for name, result in current["routes"].items():
+        base = baseline["routes"].get(name)
+        if base is None:
+            continue
+        for key in ("p95_ms", "p99_ms", "queries_per_request"):
+            if base.get(key) and result.get(key) is not None and result[key] > base[key] * (1 + threshold):
+                regressions.append(f"{name}: {key} {base[key]} -> {result[key]}")
+        if result["throughput_rps"] < base["throughput_rps"] * (1 - threshold):
+            regressions.append(f"{name}: throughput_rps {base['throughput_rps']} -> {result['throughput_rps']}")
+        if result["errors"] > base["errors"]:
+            regressions.append(f"{name}: errors {base['errors']} -> {result['errors']}")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=DEFAULT_DATABASE_URL)
+    parser.add_argument("--users", type=int, default=100000)
+    parser.add_argument("--history", type=int, default=10000000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--reset-fixtures", action="store_true",
+                        help="allow wiping a database that holds tables other than benchmark fixtures")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=1000, help="measured requests per route")
+    parser.add_argument("--warmup", type=int, default=50, help="unmeasured requests per route")
+    parser.add_argument("--routes", help="regular expression selecting scenarios by name")
+    parser.add_argument("--output", help="write results to this JSON file")
+    parser.add_argument("--compare", help="baseline JSON file to check these results against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="allowed relative regression")
+    args = parser.parse_args(argv)
+
+    # Tokens are issued and checked in this one process, so a throwaway key will do
+    app = create_app({"SQLALCHEMY_DATABASE_URI": args.database_url, "SECRET_KEY": secrets.token_hex(32),
+                      "KDF_QUEUE_DEPTH": max(32, args.concurrency * 2)})
+    print(f"Preparing fixtures ({args.users} users, {args.history} history rows)...", file=sys.stderr)
+    try:
+        ensure_fixtures(app, args.users, args.history, args.seed, args.reset_fixtures)
+    except RuntimeError as e:
+        app.extensions["kdf_pool"].shutdown()
+        parser.error(str(e))
+
+    token_service = app.extensions["token_service"]
+    server = make_server("127.0.0.1", 0, app, threaded=True, request_handler=QuietRequestHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    results = {
+        "meta": {"users": args.users, "history": args.history, "seed": args.seed, "concurrency": args.concurrency,
+                 "requests": args.requests, "database": args.database_url.split(":", 1)[0],
+                 "python": platform.python_version(), "created": datetime.now(timezone.utc).isoformat()},
+        "routes": {},
+    }
+    run_id = int(time.time())
+    try:
+        for scenario in scenarios(args, run_id, lambda user_id: token_service.issue(user_id)["access_token"]):
+            if args.routes and not re.search(args.routes, scenario.name):
+                continue
+            try:
+                result = run_scenario(base_url, scenario, args)
+            finally:
+                discard_writes(app, run_id)
+            results["routes"][scenario.name] = result
+            print(f"{scenario.name:32} p50 {result['p50_ms']:>8}ms  p95 {result['p95_ms']:>8}ms  "
+                  f"p99 {result['p99_ms']:>8}ms  {result['throughput_rps']:>8} req/s  "
+                  f"{result['queries_per_request']} q/req  {result['errors']} errors", file=sys.stderr)
+    finally:
+        server.shutdown()
+        app.extensions["kdf_pool"].shutdown()
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+            f.write("\n")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), results, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
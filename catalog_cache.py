@@ -0,0 +1,92 @@
+import gzip
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    import brotli
+except ImportError:  # optional, only gzip variants are precompressed without it
+    brotli = None
+
+COMPRESSORS = {"gzip": lambda body: gzip.compress(body, 9, mtime=0)}
+if brotli is not None:
+    COMPRESSORS["br"] = lambda body: brotli.compress(body, quality=11)
+
+
+class CatalogEntry:
+    def __init__(self, body, version, expires_at, mimetype="application/json", encodings=()):
+        self.body = body
+        self.version = version
+        self.expires_at = expires_at
+        self.mimetype = mimetype
+        self.etag = hashlib.sha256(body).hexdigest()[:32]
+        # Compressed once here, per catalog version, rather than per response
+        self.encoded = {encoding: COMPRESSORS[encoding](body) for encoding in encodings if encoding in COMPRESSORS}
+        self.size = len(body) + sum(len(encoded) for encoded in self.encoded.values())
+
+
+class CatalogCache:
+    """Pre-encoded JSON bodies for the catalog endpoints, keyed by catalog version.
+
+    Entries expire after `ttl` seconds and the least recently used ones are
+    evicted once the cached bodies exceed `max_bytes`. Bumping the version
+    (see `invalidate`) makes every existing entry stale at once. Bodies of at
+    least `compress_min_bytes` are also kept compressed with each of
+    `encodings` ("gzip", "br") that is available.
+    """
+
+    def __init__(self, ttl=300, max_bytes=8 * 1024 * 1024, encodings=(), compress_min_bytes=1024):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.encodings = tuple(encodings)
+        self.compress_min_bytes = compress_min_bytes
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def get_or_build(self, name, build):
+        """Return the entry for `name`, calling `build()` for fresh (body, mimetype) on a miss."""
+        entry, version = self.lookup(name)
+        if entry is None:
+            body, mimetype = build()
+            entry = self.store(name, body, version, mimetype)
+        return entry
+
+    def lookup(self, name):
+        """Return (entry or None, current version); pass the version to `store` after a miss."""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry.version == self.version and entry.expires_at > time.monotonic():
+                self._entries.move_to_end(name)
+                self.hits += 1
+                return entry, self.version
+            self.misses += 1
+            return None, self.version
+
+    def store(self, name, body, version, mimetype="application/json"):
+        encodings = self.encodings if len(body) >= self.compress_min_bytes else ()
+        entry = CatalogEntry(body, version, time.monotonic() + self.ttl, mimetype, encodings)
+        with self._lock:
+            # Don't store a body built against a version that has since been invalidated.
+            if entry.version == self.version and entry.size <= self.max_bytes:
+                self._discard(name)
+                self._entries[name] = entry
+                self._size += entry.size
+                while self._size > self.max_bytes:
+                    self._discard(next(iter(self._entries)))
+        return entry
+
+    def invalidate(self):
+        with self._lock:
+            self.version += 1
+            self._entries.clear()
+            self._size = 0
+
+    def _discard(self, name):
+        entry = self._entries.pop(name, None)
+        if entry is not None:
+            self._size -= entry.size
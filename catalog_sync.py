@@ -0,0 +1,73 @@
+"""Catalog delta sync over the catalog_change log.
+
+A client holds the catalog as of some version (the newest catalog_change
+version it has seen) and asks for what changed since. Each changed row is
+sent once, in its current state, or listed as deleted if it no longer
+exists. Versions are read before rows, so a response may carry rows newer
+than its version but never older; the client just sees them again next time.
+"""
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import delete, func, select
+
+from models import CatalogChange, Disease, Plant
+
+MODELS = {"plant": Plant, "disease": Disease}
+COLLECTIONS = {"plant": "plants", "disease": "diseases"}
+
+
+def catalog_versions(session):
+    """(oldest retained, current) change versions; (0, 0) before the first change."""
+    oldest, current = session.execute(select(func.min(CatalogChange.version),
+                                             func.max(CatalogChange.version))).one()
+    return oldest or 0, current or 0
+
+
+def can_sync(since, oldest, current):
+    """Whether the log still holds every change after `since` (pruned versions are all < oldest)."""
+    return 0 < since <= current and since >= oldest - 1
+
+
+def changed_records(session, since, limit):
+    """{kind: ids} changed after `since`, or None when more than `limit` rows changed."""
+    rows = session.execute(select(CatalogChange.kind, CatalogChange.record_id)
+                           .where(CatalogChange.version > since)
+                           .group_by(CatalogChange.kind, CatalogChange.record_id)
+                           .limit(limit + 1)).all()
+    if len(rows) > limit:
+        return None
+    changed = {}
+    for kind, record_id in rows:
+        changed.setdefault(kind, set()).add(record_id)
+    return changed
+
+
+def delta_payload(session, version, changed):
+    payload = {"message": "success", "version": version, "full": False}
+    for kind, collection in COLLECTIONS.items():
+        ids = changed.get(kind, set())
+        model = MODELS[kind]
+        records = session.scalars(select(model).where(model.id.in_(ids))).all() if ids else []
+        present = {record.id for record in records}
+        payload[collection] = {"upserted": [record.to_dict() for record in records],
+                               "deleted": sorted(ids - present)}
+    return payload
+
+
+def snapshot_payload(session):
+    """Every catalog row, for clients that are new or too far behind to sync."""
+    _, version = catalog_versions(session)
+    payload = {"message": "success", "version": version, "full": True}
+    for kind, collection in COLLECTIONS.items():
+        records = session.scalars(select(MODELS[kind]).order_by(MODELS[kind].id)).all()
+        payload[collection] = {"upserted": [record.to_dict() for record in records], "deleted": []}
+    return payload
+
+
+def prune_changes(session, days):
+    """Delete changes older than `days`, always keeping the newest so versions stay monotonic."""
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+    newest = select(func.max(CatalogChange.version)).scalar_subquery()
+    result = session.execute(delete(CatalogChange).where(CatalogChange.changed_at < cutoff,
+                                                         CatalogChange.version < newest))
+    return result.rowcount
@@ -0,0 +1,85 @@
+import logging
+import os
+import secrets
+
+
+def env_bool(name, default):
+    value = os.environ.get(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+class Config:
+    SQLALCHEMY_DATABASE_URI = os.environ.get("DATABASE_URL", "postgresql://postgres@localhost:5432/plantdoc_db")
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Connection pool; pool size/overflow/timeout are ignored for SQLite
+    DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT = int(os.environ.get("DB_POOL_TIMEOUT", 30))
+    DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", 1800))
+    DB_POOL_PRE_PING = env_bool("DB_POOL_PRE_PING", True)
+
+    # Log requests slower than this many seconds with their SQL; None disables the slow-request log
+    SLOW_REQUEST_THRESHOLD = float(os.environ["SLOW_REQUEST_THRESHOLD"]) if os.environ.get("SLOW_REQUEST_THRESHOLD") else None
+
+    CATALOG_CACHE_TTL = 300
+    CATALOG_CACHE_MAX_BYTES = 8 * 1024 * 1024
+    # Catalog bodies at least this large are also cached gzip/brotli-compressed
+    CATALOG_COMPRESSION = ("br", "gzip")
+    COMPRESS_MIN_BYTES = 1024
+    # /sync sends a full snapshot rather than a delta of more rows than this
+    SYNC_MAX_CHANGES = 500
+    # `flask prune-catalog-changes` default; clients last synced before this get a full snapshot
+    SYNC_LOG_RETENTION_DAYS = 90
+    HISTORY_PAGE_SIZE = 50
+    HISTORY_MAX_PAGE_SIZE = 200
+    HISTORY_BATCH_MAX_ITEMS = 1000
+    # "memory" (in-process BM25 index) or "postgres" (tsvector + GIN, see the search migration)
+    SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "memory")
+    SEARCH_MAX_RESULTS = 100
+    USERS_PAGE_SIZE = 100
+    USERS_MAX_PAGE_SIZE = 1000
+    USERS_EXPORT_CHUNK_SIZE = 1000
+
+    KDF_POOL_SIZE = int(os.environ.get("KDF_POOL_SIZE", 2))
+    KDF_QUEUE_DEPTH = int(os.environ.get("KDF_QUEUE_DEPTH", 32))
+    KDF_TIMEOUT = 10
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    PASSWORD_SALT_LENGTH = 16
+
+    # Required unless TESTING or DEBUG is on, see secret_key()
+    SECRET_KEY = os.environ.get("SECRET_KEY")
+    ACCESS_TOKEN_TTL = 15 * 60
+    REFRESH_TOKEN_TTL = 30 * 24 * 3600
+
+
+def engine_options(config):
+    """SQLAlchemy create_engine() options for the configured database and pool settings."""
+    options = {
+        "pool_pre_ping": config["DB_POOL_PRE_PING"],
+        "pool_recycle": config["DB_POOL_RECYCLE"],
+    }
+    if not config["SQLALCHEMY_DATABASE_URI"].startswith("sqlite"):
+        options.update(
+            pool_size=config["DB_POOL_SIZE"],
+            max_overflow=config["DB_MAX_OVERFLOW"],
+            pool_timeout=config["DB_POOL_TIMEOUT"],
+        )
+    return {**options, **config.get("SQLALCHEMY_ENGINE_OPTIONS", {})}
+
+
+def secret_key(config):
+    """The configured SECRET_KEY; a random one (with a warning) under TESTING or DEBUG, else an error.
+
+    A random key is per process, so tokens issued by one worker would be
+    rejected by every other worker and after each restart.
+    """
+    if config.get("SECRET_KEY"):
+        return config["SECRET_KEY"]
+    if config.get("TESTING") or config.get("DEBUG"):
+        logging.getLogger(__name__).warning("SECRET_KEY is not set; using a random key, tokens will not "
+                                            "survive a restart or work across worker processes")
+        return secrets.token_hex(32)
+    raise RuntimeError("SECRET_KEY must be set (or run with TESTING or DEBUG enabled)")
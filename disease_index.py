@@ -0,0 +1,55 @@
+import threading
+import time
+from types import MappingProxyType
+
+
+class DiseaseIndex:
+    """Immutable lookup of disease records by model class index, optionally scoped to a plant.
+
+    A class index can be shared by several plants' models, so `lookup` returns
+    every match ordered by (plant_id, id). `resolve` returns the first of them.
+    """
+
+    def __init__(self, diseases):
+        by_class = {}
+        by_plant_class = {}
+        for disease in sorted(diseases, key=lambda d: (d["plant_id"], d["id"])):
+            record = MappingProxyType(dict(disease))
+            by_class.setdefault(record["class_index"], []).append(record)
+            by_plant_class.setdefault((record["plant_id"], record["class_index"]), record)
+        self.by_class = MappingProxyType({index: tuple(records) for index, records in by_class.items()})
+        self.by_plant_class = MappingProxyType(by_plant_class)
+
+    def lookup(self, class_index, plant_id=None):
+        if plant_id is None:
+            return self.by_class.get(class_index, ())
+        record = self.by_plant_class.get((plant_id, class_index))
+        return (record,) if record is not None else ()
+
+    def resolve(self, class_index, plant_id=None):
+        records = self.lookup(class_index, plant_id)
+        return records[0] if records else None
+
+
+class DiseaseIndexHolder:
+    """Keeps the current DiseaseIndex, rebuilding it when the catalog version moves on or it outlives `ttl`."""
+
+    def __init__(self, catalog_cache, load, ttl=300):
+        self.catalog_cache = catalog_cache
+        self.load = load
+        self.ttl = ttl
+        self._index = None
+        self._version = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+
+    def get(self):
+        version = self.catalog_cache.version
+        if self._index is not None and self._version == version and self._expires_at > time.monotonic():
+            return self._index
+        with self._lock:
+            if self._index is None or self._version != version or self._expires_at <= time.monotonic():
+                self._index = DiseaseIndex(self.load())
+                self._version = version
+                self._expires_at = time.monotonic() + self.ttl
+            return self._index
@@ -0,0 +1,93 @@
+"""Diagnosis counters per user, class and UTC day (the history_stat table).
+
+Writers run `user_history_lock`, call `stat_deltas` with the rows they
+insert and the rows they overwrite, then execute `stats_upsert_statement`
+with the result in the same transaction. The counters therefore commit or
+roll back together with the history rows. Reads (`stats_statement`) touch
+one row per bucket, however many history rows went into it.
+"""
+from collections import Counter
+from datetime import timezone
+
+from sqlalchemy import Date, cast, delete, func, insert, select, text
+
+from models import History, HistoryStat, dialect_insert
+
+
+# Arbitrary first key of the per-user pg_advisory_xact_lock(key, user_id) held by history writers
+HISTORY_WRITE_LOCK = 7306
+
+
+def user_history_lock(dialect_name, user_id):
+    """A statement that serializes this transaction's history writes with other writers for the user.
+
+    Run it before reading the rows that will be replaced, and before any
+    other write in the transaction. Otherwise two writers of the same new
+    (user_id, date) could both read "not there yet" and both count it.
+    PostgreSQL takes a per-user advisory lock. SQLite has no such lock, so
+    the transaction is started with BEGIN IMMEDIATE, which takes the
+    database's single write lock up front.
+    """
+    if dialect_name == "postgresql":
+        return text("SELECT pg_advisory_xact_lock(:key, :user_id)").bindparams(key=HISTORY_WRITE_LOCK,
+                                                                                user_id=user_id)
+    return text("BEGIN IMMEDIATE")
+
+
+def day_bucket(timestamp):
+    """The UTC date of a history timestamp; naive timestamps (SQLite) are already UTC."""
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc)
+    return timestamp.date()
+
+
+def stat_deltas(inserted, replaced=()):
+    """Counter changes for history rows written and (user_id, predicted_class_id, date) rows overwritten."""
+    deltas = Counter()
+    for row in inserted:
+        deltas[(row["user_id"], row["predicted_class_id"], day_bucket(row["date"]))] += 1
+    for user_id, predicted_class_id, date in replaced:
+        deltas[(user_id, predicted_class_id, day_bucket(date))] -= 1
+    return [{"user_id": user_id, "predicted_class_id": predicted_class_id, "day": day, "count": count}
+            for (user_id, predicted_class_id, day), count in deltas.items() if count]
+
+
+def stats_upsert_statement(dialect_name):
+    """Add each parameter set's `count` to its bucket, creating the bucket if needed."""
+    statement = dialect_insert(HistoryStat.__table__, dialect_name)
+    return statement.on_conflict_do_update(
+        index_elements=["user_id", "predicted_class_id", "day"],
+        set_={"count": HistoryStat.__table__.c.count + statement.excluded.count},
+    )
+
+
+def stats_statement(user_id=None, start=None, end=None, predicted_class_id=None, per_day=True):
+    """Summed counts per (day, class), or per class over the whole range when not `per_day`.
+
+    `user_id` None covers all users; `start` and `end` are inclusive dates.
+    """
+    columns = [HistoryStat.day, HistoryStat.predicted_class_id] if per_day else [HistoryStat.predicted_class_id]
+    total = func.sum(HistoryStat.count).label("count")
+    statement = select(*columns, total).group_by(*columns).having(total > 0).order_by(*columns)
+    if user_id is not None:
+        statement = statement.where(HistoryStat.user_id == user_id)
+    if start is not None:
+        statement = statement.where(HistoryStat.day >= start)
+    if end is not None:
+        statement = statement.where(HistoryStat.day <= end)
+    if predicted_class_id is not None:
+        statement = statement.where(HistoryStat.predicted_class_id == predicted_class_id)
+    return statement
+
+
+def rebuild_stats(session):
+    """Recompute every counter from the history table in the session's transaction."""
+    if session.get_bind().dialect.name == "postgresql":
+        day = cast(func.timezone("UTC", History.date), Date)
+    else:
+        # SQLite stores the UTC timestamp as text, so its date prefix is the UTC day
+        day = func.date(History.date)
+    counts = (select(History.user_id, History.predicted_class_id, day, func.count())
+              .group_by(History.user_id, History.predicted_class_id, day))
+    session.execute(delete(HistoryStat))
+    session.execute(insert(HistoryStat).from_select(["user_id", "predicted_class_id", "day", "count"], counts))
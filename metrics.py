@@ -0,0 +1,194 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+from flask import current_app, g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+
+def escape_label(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(names, values):
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in self._values.items():
+                lines.append(f"{self.name}{format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Per-bucket (non-cumulative) counts, then +Inf, then the sum
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        for key, values in series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), values):
+                cumulative += count
+                labels = format_labels(self.labelnames + ("le",), key + (bound,))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {values[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class AppMetrics:
+    """The app's metrics, rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self.request_seconds = Histogram("plantdoc_request_duration_seconds", "Request latency by route.",
+                                         ("route", "method", "status"))
+        self.request_queries = Histogram("plantdoc_request_sql_statements", "SQL statements issued per request.",
+                                         ("route",), COUNT_BUCKETS)
+        self.request_db_seconds = Histogram("plantdoc_request_db_seconds", "Cumulative SQL time per request.",
+                                            ("route",))
+        self.pool_wait_seconds = Histogram("plantdoc_db_pool_checkout_wait_seconds",
+                                           "Time spent waiting for a pooled connection.")
+        self.kdf_seconds = Histogram("plantdoc_kdf_duration_seconds", "Password hashing time, including queueing.",
+                                     ("operation",))
+        self.slow_requests = Counter("plantdoc_slow_requests_total", "Requests over SLOW_REQUEST_THRESHOLD.",
+                                     ("route",))
+        self.collectors = []
+
+    def render(self):
+        lines = []
+        for metric in (self.request_seconds, self.request_queries, self.request_db_seconds,
+                       self.pool_wait_seconds, self.kdf_seconds, self.slow_requests):
+            lines.extend(metric.render())
+        for collect in self.collectors:
+            lines.extend(collect())
+        return "\n".join(lines) + "\n"
+
+
+def catalog_cache_collector(cache):
+    def collect():
+        total = cache.hits + cache.misses
+        return [
+            "# HELP plantdoc_catalog_cache_requests_total Catalog cache lookups by result.",
+            "# TYPE plantdoc_catalog_cache_requests_total counter",
+            f'plantdoc_catalog_cache_requests_total{{result="hit"}} {cache.hits}',
+            f'plantdoc_catalog_cache_requests_total{{result="miss"}} {cache.misses}',
+            "# HELP plantdoc_catalog_cache_hit_ratio Fraction of catalog cache lookups served from memory.",
+            "# TYPE plantdoc_catalog_cache_hit_ratio gauge",
+            f"plantdoc_catalog_cache_hit_ratio {cache.hits / total if total else 0}",
+        ]
+    return collect
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that notes how long each checkout waited, for the "checkout" event to report."""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        record = super()._do_get()
+        record.info["checkout_wait"] = time.perf_counter() - started
+        return record
+
+
+def init_metrics(app, engine):
+    """Collect per-request latency and SQL statistics for `app` on `engine`."""
+    metrics = app.extensions["metrics"]
+    slow_threshold = app.config["SLOW_REQUEST_THRESHOLD"]
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        if has_request_context() and "sql_count" in g:
+            g.sql_count += 1
+            g.sql_seconds += elapsed
+            if slow_threshold is not None:
+                g.sql_statements.append((elapsed, statement))
+
+    @event.listens_for(engine, "handle_error")
+    def handle_error(context):
+        if context.connection is not None and context.connection.info.get("query_started"):
+            context.connection.info["query_started"].pop()
+
+    @event.listens_for(engine, "checkout")
+    def checkout(dbapi_connection, connection_record, connection_proxy):
+        wait = connection_record.info.pop("checkout_wait", None)
+        if wait is not None:
+            metrics.pool_wait_seconds.observe(wait)
+
+    @app.before_request
+    def start_request_metrics():
+        g.request_started = time.perf_counter()
+        g.sql_count = 0
+        g.sql_seconds = 0.0
+        g.sql_statements = []
+
+    @app.after_request
+    def record_request_metrics(response):
+        if "request_started" not in g:
+            return response
+        elapsed = time.perf_counter() - g.request_started
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        metrics.request_seconds.observe(elapsed, route=route, method=request.method, status=response.status_code)
+        metrics.request_queries.observe(g.sql_count, route=route)
+        metrics.request_db_seconds.observe(g.sql_seconds, route=route)
+
+        if slow_threshold is not None and elapsed >= slow_threshold:
+            metrics.slow_requests.inc(route=route)
+            statements = "\n".join(f"  {seconds * 1000:.1f}ms {statement}" for seconds, statement in g.sql_statements)
+            current_app.logger.warning("Slow request %s %s: %.1fms, %d SQL statements (%.1fms)\n%s",
+                                       request.method, request.full_path, elapsed * 1000,
+                                       g.sql_count, g.sql_seconds * 1000, statements)
+        return response
@@ -0,0 +1,73 @@
+"""initial schema
+
+Matches the tables previously created by db.create_all(). Databases that
+already have them should be stamped rather than upgraded through this
+revision:
+
+    flask db stamp 3f1c2a9d7b10
+    flask db upgrade
+
+Revision ID: 3f1c2a9d7b10
+Revises: 
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9d7b10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('user',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('first_name', sa.String(), nullable=False),
+        sa.Column('last_name', sa.String(), nullable=False),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('password', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('email')
+    )
+    op.create_table('plant',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('image_url', sa.String(), nullable=False),
+        sa.Column('botanical_name', sa.String(), nullable=False),
+        sa.Column('general_info', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('botanical_name')
+    )
+    op.create_table('disease',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('class_index', sa.Integer(), nullable=False),
+        sa.Column('plant_id', sa.Integer(), nullable=False),
+        sa.Column('botanical_name', sa.String(), nullable=False),
+        sa.Column('image_url', sa.String(), nullable=False),
+        sa.Column('symptoms', sa.String(), nullable=False),
+        sa.Column('cause', sa.String(), nullable=False),
+        sa.Column('propagation', sa.String(), nullable=False),
+        sa.Column('control', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('history',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('predicted_class_id', sa.Integer(), nullable=False),
+        sa.Column('local_url', sa.String(), nullable=False),
+        sa.Column('remote_url', sa.String(), nullable=False),
+        sa.Column('date', sa.String(), nullable=False),
+        sa.PrimaryKeyConstraint('user_id', 'date'),
+        sa.UniqueConstraint('local_url')
+    )
+
+
+def downgrade():
+    op.drop_table('history')
+    op.drop_table('disease')
+    op.drop_table('plant')
+    op.drop_table('user')
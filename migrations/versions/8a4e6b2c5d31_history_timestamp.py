@@ -0,0 +1,89 @@
+"""history.date as a timestamp
+
+Existing string dates must be ISO 8601 (e.g. "2024-07-31 10:15:22" or
+"2024-07-31T10:15:22+02:00"). Values without an offset are taken as UTC, as
+the API does for new writes, and explicit offsets are kept. No extra index
+is needed for keyset pagination: the (user_id, date) primary key already
+serves it, scanned backwards for newest-first pages.
+
+PostgreSQL casts the column in place. SQLite's CAST(... AS DATETIME) has
+numeric affinity and would turn "2024-07-31 10:15:22" into 2024, so there
+the values are converted in Python into a new column and the table is
+rebuilt around it.
+
+Revision ID: 8a4e6b2c5d31
+Revises: 3f1c2a9d7b10
+Create Date: 2026-10-18 12:10:00.000000
+
+"""
+from datetime import datetime, timezone
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4e6b2c5d31'
+down_revision = '3f1c2a9d7b10'
+branch_labels = None
+depends_on = None
+
+
+def utc_timestamp(value):
+    try:
+        timestamp = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"history.date {value!r} is not an ISO 8601 timestamp; fix it and rerun the migration")
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+
+def upgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'postgresql':
+        # Naive strings are read in the session time zone; offsets in the string still win
+        op.execute("SET LOCAL TIME ZONE 'UTC'")
+        with op.batch_alter_table('history') as batch_op:
+            batch_op.alter_column('date',
+                                  existing_type=sa.String(),
+                                  type_=sa.DateTime(timezone=True),
+                                  existing_nullable=False,
+                                  postgresql_using='date::timestamptz')
+        return
+
+    op.add_column('history', sa.Column('date_utc', sa.DateTime(timezone=True), nullable=True))
+    history = sa.table('history',
+                       sa.column('user_id', sa.Integer()),
+                       sa.column('date', sa.String()),
+                       sa.column('date_utc', sa.DateTime(timezone=True)))
+    rows = bind.execute(sa.select(history.c.user_id, history.c.date)).all()
+    if rows:
+        bind.execute(history.update()
+                     .where(history.c.user_id == sa.bindparam('old_user_id'),
+                            history.c.date == sa.bindparam('old_date'))
+                     .values(date_utc=sa.bindparam('new_date')),
+                     [{'old_user_id': user_id, 'old_date': date, 'new_date': utc_timestamp(date)}
+                      for user_id, date in rows])
+    op.create_table('history_new',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('predicted_class_id', sa.Integer(), nullable=False),
+        sa.Column('local_url', sa.String(), nullable=False),
+        sa.Column('remote_url', sa.String(), nullable=False),
+        sa.Column('date', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('user_id', 'date'),
+        sa.UniqueConstraint('local_url')
+    )
+    op.execute("INSERT INTO history_new (user_id, predicted_class_id, local_url, remote_url, date) "
+               "SELECT user_id, predicted_class_id, local_url, remote_url, date_utc FROM history")
+    op.drop_table('history')
+    op.rename_table('history_new', 'history')
+
+
+def downgrade():
+    with op.batch_alter_table('history') as batch_op:
+        batch_op.alter_column('date',
+                              existing_type=sa.DateTime(timezone=True),
+                              type_=sa.String(),
+                              existing_nullable=False,
+                              postgresql_using="(date AT TIME ZONE 'UTC')::text")
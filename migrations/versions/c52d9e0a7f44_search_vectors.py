@@ -0,0 +1,46 @@
+"""tsvector columns and GIN indexes for SEARCH_BACKEND=postgres
+
+PostgreSQL only (generated columns need 12+); a no-op elsewhere.
+
+Revision ID: c52d9e0a7f44
+Revises: 8a4e6b2c5d31
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'c52d9e0a7f44'
+down_revision = '8a4e6b2c5d31'
+branch_labels = None
+depends_on = None
+
+PLANT_VECTOR = """
+    setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(botanical_name, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(general_info, '')), 'C')
+"""
+
+DISEASE_VECTOR = """
+    setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+    setweight(to_tsvector('english', coalesce(botanical_name, '')), 'B') ||
+    setweight(to_tsvector('english', coalesce(symptoms, '') || ' ' || coalesce(cause, '') || ' ' ||
+                                     coalesce(propagation, '') || ' ' || coalesce(control, '')), 'C')
+"""
+
+
+def upgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table, vector in (('plant', PLANT_VECTOR), ('disease', DISEASE_VECTOR)):
+        op.execute(f"ALTER TABLE {table} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS ({vector}) STORED")
+        op.create_index(f'ix_{table}_search_vector', table, ['search_vector'], postgresql_using='gin')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    for table in ('plant', 'disease'):
+        op.drop_index(f'ix_{table}_search_vector', table_name=table)
+        op.drop_column(table, 'search_vector')
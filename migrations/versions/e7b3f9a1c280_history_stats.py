@@ -0,0 +1,35 @@
+"""history_stat: diagnosis counts per user, class and day
+
+Starts empty; run `flask rebuild-history-stats` after upgrading to backfill
+it from existing history.
+
+Revision ID: e7b3f9a1c280
+Revises: c52d9e0a7f44
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b3f9a1c280'
+down_revision = 'c52d9e0a7f44'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('history_stat',
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('predicted_class_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('user_id', 'predicted_class_id', 'day')
+    )
+    op.create_index('ix_history_stat_day', 'history_stat', ['day', 'predicted_class_id'])
+
+
+def downgrade():
+    op.drop_index('ix_history_stat_day', table_name='history_stat')
+    op.drop_table('history_stat')
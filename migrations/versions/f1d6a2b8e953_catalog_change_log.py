@@ -0,0 +1,33 @@
+"""catalog_change: versioned log of plant and disease writes for /sync
+
+Starts empty, so every client's first sync is a full snapshot.
+
+Revision ID: f1d6a2b8e953
+Revises: e7b3f9a1c280
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1d6a2b8e953'
+down_revision = 'e7b3f9a1c280'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('catalog_change',
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('record_id', sa.Integer(), nullable=False),
+        sa.Column('changed_at', sa.DateTime(timezone=True), nullable=False),
+        sa.PrimaryKeyConstraint('version'),
+        sqlite_autoincrement=True
+    )
+
+
+def downgrade():
+    op.drop_table('catalog_change')
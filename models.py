@@ -0,0 +1,352 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from flask import current_app
+from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, insert, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import object_session
+
+db = SQLAlchemy()
+
+def dialect_insert(table, dialect_name):
+    """An INSERT for `table` that supports on_conflict_do_update(), on PostgreSQL and SQLite."""
+    dialects = {"postgresql": postgresql, "sqlite": sqlite}
+    dialect = dialects.get(dialect_name)
+    if dialect is None:
+        raise NotImplementedError(f"Upserts are not supported on {dialect_name}")
+    return dialect.insert(table)
+
+def utc_isoformat(timestamp):
+    """ISO 8601 with an offset, whatever the backend; SQLite returns naive values, stored in UTC."""
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.isoformat()
+
+@dataclass
+class User(db.Model):
+    __tablename__ = "user"
+    id = db.Column(db.Integer, primary_key=True)
+    first_name = db.Column(db.String(), nullable=False)
+    last_name = db.Column(db.String(), nullable=False)
+    email = db.Column(db.String(), unique=True, nullable=False)
+    password = db.Column(db.String(), nullable=False)
+
+    def __repr__(self):
+        return f'{self.to_dict()}'
+    
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "first_name": self.first_name,
+            "last_name": self.last_name,
+            "email": self.email,
+            "password": self.password
+        }
+
+    def to_public_dict(self):
+        user = self.to_dict()
+        del user["password"]
+        return user
+
+@dataclass
+class Plant(db.Model):
+    __tablename__ = "plant"
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(), nullable=False)
+    image_url = db.Column(db.String(), nullable=False)
+    botanical_name = db.Column(db.String(), unique=True, nullable=False)
+    general_info = db.Column(db.String(), nullable=False)
+
+    def __repr__(self):
+        return f'{self.to_dict()}'
+    
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "image_url": self.image_url,
+            "botanical_name": self.botanical_name,
+            "general_info": self.general_info
+        }
+
+@dataclass
+class Disease(db.Model):
+    __tablename__ = "disease"
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(), nullable=False)
+    class_index = db.Column(db.Integer, nullable=False)
+    plant_id = db.Column(db.Integer, nullable=False)
+    botanical_name = db.Column(db.String(), nullable=False)
+    image_url = db.Column(db.String(), nullable=False)
+    symptoms = db.Column(db.String(), nullable=False)
+    cause = db.Column(db.String(), nullable=False)
+    propagation = db.Column(db.String(), nullable=False)
+    control = db.Column(db.String(), nullable=False)
+
+    def __repr__(self):
+        return f'{self.to_dict()}'
+    
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "name": self.name,
+            "class_index": self.class_index,
+            "plant_id": self.plant_id,
+            "botanical_name": self.botanical_name,
+            "image_url": self.image_url,
+            "symptoms": self.symptoms,
+            "cause": self.cause,
+            "propagation": self.propagation,
+            "control": self.control
+        }
+
+@dataclass
+class History(db.Model):
+    __tablename__ = "history"
+    user_id = db.Column(db.Integer, nullable=False, primary_key=True)
+    predicted_class_id = db.Column(db.Integer, nullable=False)
+    local_url = db.Column(db.String(), unique=True, nullable=False)
+    remote_url = db.Column(db.String(), nullable=False)
+    # The (user_id, date) primary key also serves /history's newest-first keyset scans
+    date = db.Column(db.DateTime(timezone=True), nullable=False, primary_key=True)
+
+    def __repr__(self):
+        return f'{self.to_dict()}'
+    
+    def to_dict(self):
+        return {
+            "user_id": self.user_id,
+            "predicted_class_id": self.predicted_class_id,
+            "local_url": self.local_url,
+            "remote_url": self.remote_url,
+            "date": utc_isoformat(self.date),
+        }
+
+# Diagnosis counts per user, class and UTC day, kept in step with history by the
+# routes that write it (see history_stats.py); `flask rebuild-history-stats` recomputes them.
+@dataclass
+class HistoryStat(db.Model):
+    __tablename__ = "history_stat"
+    user_id = db.Column(db.Integer, nullable=False, primary_key=True)
+    predicted_class_id = db.Column(db.Integer, nullable=False, primary_key=True)
+    day = db.Column(db.Date, nullable=False, primary_key=True)
+    count = db.Column(db.Integer, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_history_stat_day", day, predicted_class_id),
+    )
+
+    def __repr__(self):
+        return f'{self.to_dict()}'
+
+    def to_dict(self):
+        return {
+            "user_id": self.user_id,
+            "predicted_class_id": self.predicted_class_id,
+            "day": self.day.isoformat(),
+            "count": self.count,
+        }
+
+# One row per Plant/Disease insert, update or delete; `version` orders them for /sync.
+@dataclass
+class CatalogChange(db.Model):
+    __tablename__ = "catalog_change"
+    version = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(), nullable=False)
+    record_id = db.Column(db.Integer, nullable=False)
+    changed_at = db.Column(db.DateTime(timezone=True), nullable=False)
+
+    # Never reuse a version, even after pruning
+    __table_args__ = {"sqlite_autoincrement": True}
+
+    def __repr__(self):
+        return f'{self.to_dict()}'
+
+    def to_dict(self):
+        return {
+            "version": self.version,
+            "kind": self.kind,
+            "record_id": self.record_id,
+            "changed_at": utc_isoformat(self.changed_at),
+        }
+
+# Arbitrary pg_advisory_xact_lock key held by transactions that write the catalog
+CATALOG_CHANGE_LOCK = 7305
+
+# Record Plant/Disease writes in catalog_change and, once their transaction commits,
+# invalidate the catalog cache and update the search index. Bulk query.update()/delete()
+# bypass these hooks: they are missing from /sync and only picked up by the caches' TTLs.
+def record_catalog_change(connection, target, record):
+    if connection.dialect.name == "postgresql":
+        # Serialize catalog writers so versions become visible in order and /sync never skips one
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CATALOG_CHANGE_LOCK})
+    connection.execute(insert(CatalogChange.__table__).values(
+        kind=target.__tablename__, record_id=target.id, changed_at=datetime.now(timezone.utc)))
+
+    session = object_session(target)
+    if session is not None:
+        session.info.setdefault("catalog_changes", []).append((target.__tablename__, target.id, record))
+
+def record_catalog_write(mapper, connection, target):
+    record_catalog_change(connection, target, target.to_dict())
+
+def record_catalog_delete(mapper, connection, target):
+    record_catalog_change(connection, target, None)
+
+for model in (Plant, Disease):
+    event.listen(model, "after_insert", record_catalog_write)
+    event.listen(model, "after_update", record_catalog_write)
+    event.listen(model, "after_delete", record_catalog_delete)
+
+@event.listens_for(db.session, "after_commit")
+def apply_catalog_changes(session):
+    changes = session.info.pop("catalog_changes", None)
+    if changes:
+        current_app.extensions["catalog_cache"].invalidate()
+        current_app.extensions["search"].apply(changes)
+
+@event.listens_for(db.session, "after_rollback")
+def discard_catalog_changes(session):
+    session.info.pop("catalog_changes", None)
+
+# plants = [
+#     Plant(
+#         id = 1,
+#         name = "Tomato",
+#         image_url="https://plantvillage-production-new.s3.amazonaws.com/image/1200/file/medium-2c50f2ab34ec579ecbd4b8348c3796e3.jpg",
+#         botanical_name = "Lycopersicon esculentum",
+#         general_info = "Tomato is an herbaceous annual in the family Solanaceae grown for its edible fruit. The plant can be erect with short stems or vine-like with long, spreading stems.\n\n" +
+#         "The stems are covered in coarse hairs and the leaves are arranged spirally. The tomato plant produces yellow flowers, which can develop into a cyme of 3–12, and usually, a round fruit (berry) that is fleshy, smoothed skin, and can be red, pink, purple, brown, orange, or yellow in color.\n\n" +
+#         "The tomato plant can grow 0.7–2 m (2.3–6.6 ft) in height and as an annual, is harvested after only one growing season. Tomato may also be referred to as the love apple and originates from South America.\n\n" +
+#         "Tomatoes are native to South and Central America, but they are now grown all over the world.\n\n" +
+#         "Tomatoes are one of Africa's most widely grown vegetable crops. They are grown for home consumption in almost every homestead's backyard across Sub-Saharan Africa.\n\n" +
+#         "They are a good source of vitamins as well as a cash crop for smallholders and medium-scale commercial farmers. Tomatoes used as flavor enhancers in food are always in high demand, both fresh and processed."
+#     )
+# ]
+# db.session.add_all(plants)
+# db.session.commit()
+
+# diseases = [
+#     Disease(
+#                 id = 1,
+#                 name = "Early blight",
+#                 class_index = 1,
+#                 plant_id = 1,
+#                 botanical_name = "Alternaria solani",
+#                 image_url = "https://plantvillage-production-new.s3.amazonaws.com/image/1174/file/default-8f41d050e6c87d875b13a6bf63c6e202.jpg",
+#                 symptoms = "Early blight symptoms start as oval shaped lesions with a yellow chlorotic region across the lesion; concentric leaf lesions may be seen on infected leaves; leaf tissue between veins is destroyed; severe infections can cause leaves to completely collapse; as the disease progresses leaves become severely blighted leading to reduced yield; tomato stems may become infected with the fungus leading to Alternaria stem canker; initial symptoms of of stem canker are the development of dark brown regions on the stem; stem cankers may enlarge to girdle the whole stem resulting in the death of the whole plant; brown streaks can be found in the vascular tissue above and below the canker region; fruit symptoms include small black v-shaped lesions at the shoulders of the fruit (the disease is also known black shoulder); lesions may also appear on the fruit as dark flecks with concentric ring pattern; fruit lesions can seen in the field or may develop during fruit transit to the market; the lesions may have a velvety appearance caused by sporulation of the fungus",
+#                 cause = "Fungus",
+#                 propagation = "Disease can spread rapidly after plants have set fruit; movement of air-borne spores and contact with infested soil are causes for the spread of the disease",
+#                 control = "Apply appropriate fungicide at first sign of disease; destroy any volunteer solanaceous plants (tomato, potato, nightshade etc); practice crop rotation",
+#             ),
+#             Disease(
+#                 id = 2,
+#                 name = "Leaf Mold",
+#                 class_index = 3,
+#                 plant_id = 1,
+#                 botanical_name = "Passalora fulva",
+#                 image_url = "https://plantvillage-production-new.s3.amazonaws.com/image/63616/file/default-fcdcc0914dbf2813e91de329afb2af7c.jpg",
+#                 symptoms = "The older leaves exhibit pale greenish to yellow spots (without distinguishable margins) on upper surface. Whereas the lower portion of this spots exhibit green to brown velvety fungal growth. As the disease progress the spots may coalesce and appear brown. The infected leaves become wither and die but stay attached to the plant. The fungus also infects flowers and fruits. The affected flowers become black and drop off. The affected fruit intially shows smooth black irregular area on the stem end but later it becomes sunken, leathery and dry.",
+#                 cause = "Fungus",
+#                 propagation = "The disease is favored by high relative humidity. Also a common disease in green house tomato crop.",
+#                 control = "Grow available resistant varieties. Avoid leaf wetting and overhead application of water. Follow proper spacing to provide good air circulation around the plants. Remove the infected plant debris and burn them. If the disease is severe scary suitable fungicide.",
+#             ),
+#             Disease(
+#                 id = 3,
+#                 name = "Septoria Leaf Spot",
+#                 class_index = 4,
+#                 plant_id = 1,
+#                 botanical_name = "Septoria lycopersici",
+#                 image_url = "https://plantvillage-production-new.s3.amazonaws.com/image/632/file/default-12fb494e83390ef47bc24b4ac6950815.jpg",
+#                 symptoms = "Symptoms may occur at any stage of tomato development and begin as small, water-soaked spots or circular grayish-white spots on the underside of older leaves; spots have a grayish center and a dark margin and they may colasece; fungal fruiting bodies are visible as tiny black specks in the center of spot; spots may also appear on stems, fruit calyxes, and flowers.",
+#                 cause = "Fungus",
+#                 propagation = "Spread by water splash; fungus overwinters in plant debris.",
+#                 control = "Ensure all tomato crop debris is removed and destroyed in Fall or plowed deep into soil; plant only disease-free material; avoid overhead irrigation; stake plants to increase air circulation through the foliage; apply appropriate fungicide if necessary.",
+#             ),
+#             Disease(
+#                 id = 4,
+#                 name = "Target Spot",
+#                 class_index = 6,
+#                 plant_id = 1,
+#                 botanical_name = "Corynespora cassiicola",
+#                 image_url = "https://plantvillage-production-new.s3.amazonaws.com/image/63709/file/default-af946e9dfa8d58fc9035c811da13d461.jpg",
+#                 symptoms = "The fungus infects all parts of plant. Infected leaves shows small, pinpoint, water soaked spots initially. As the disease progress the spots enlarge to become necrotic lesions with conspicuous concentric circles, dark margins and light brown centers. Whereas the fruits exhibit brown, slightly sunken flecks in the beginning but later the lesions become large pitted appearance.",
+#                 cause = "Fungus",
+#                 propagation = "The pathogen infects cucumber, pawpaw , ornamental plants, some weed species etc. The damaged fruits are susceptible for this disease.",
+#                 control = "Remove the plant debris and burn them. Avoid over application of nitrogen fertilizer. If the disease is severe spray suitable fungicides.",
+#             ),
+#             Disease(
+#                 id = 5,
+#                 name = "Bacterial spot",
+#                 class_index = 0,
+#                 plant_id = 1,
+#                 botanical_name = "Xanthomonas campestris pv. vesicatoria",
+#                 image_url = "https://plantvillage-production-new.s3.amazonaws.com/image/4118/file/default-b533c30a34a8148266e60523a83461fd.jpg",
+#                 symptoms = "Bacterial spot lesions starts out as small water-soaked spots; lesions become more numerous and coalesce to form necrotic areas on the leaves giving them a blighted appearance; of leaves drop from the plant severe defoliation can occur leaving the fruit susceptible to sunscald; mature spots have a greasy appearance and may appear transparent when held up to light; centers of lesions dry up and fall out of the leaf; blighted leaves often remain attached to the plant and give it a blighted appearance; fruit infections start as a slightly raised blister; lesions may have a faint halo which eventually disappears; lesions on fruit may have a raised margin and sunken center which gives the fruit a scabby appearance.",
+#                 cause = "Bacterium",
+#                 propagation = "Bacteria survive on crop debris; disease emergence favored by warm temperatures and wet weather; symptoms are very similar to other tomato diseases but only bacterial spot will cause a cut leaf to ooze bacterial exudate; the disease is spread by infected seed, wind-driven rain, diseased transplants, or infested soil; bacteria enter the plant through any natural openings on the leaves or any openings caused by injury to the leaves.",
+#                 control = "Use only certified seed and healthy transplants; remove all crop debris from planting area; do not use sprinkler irrigation, instead water from base of plant; rotate crops.",
+#             ),
+#             Disease(
+#                 id = 6,
+#                 name = "Late blight",
+#                 class_index = 2,
+#                 plant_id = 1,
+#                 botanical_name = "Phytophthora infestans",
+#                 image_url = "https://plantvillage-production-new.s3.amazonaws.com/image/1187/file/default-7add4975438ae1ed96ee04b40bcb0cb8.jpg",
+#                 symptoms = "Late blight affects all aerial parts of the tomato plant; initial symptoms of the disease appear as water-soaked green to black areas on leaves which rapidly change to brown lesions; fluffy white fungal growth may appear on infected areas and leaf undersides during wet weather; as the disease progresses, foliage becomes becomes shriveled and brown and the entire plant may die; fruit lesions start as irregularly shaped water soaked regions and change to greasy spots; entire fruit may become infected and a white fuzzy growth may appear during wet weather.",
+#                 cause = "Oomycete",
+#                 propagation = "Can devastate tomato plantings.",
+#                 control = "Plant resistant varieties; if signs of disease are present or if rainy conditions are likely or if using overhead irrigation appropriate fungicides should be applied.",
+#             ),
+#             Disease(
+#                 id = 7,
+#                 name = "Tomato mosaic virus",
+#                 class_index = 8,
+#                 plant_id = 1,
+#                 botanical_name = "Tomato mosaic virus (ToMV)",
+#                 image_url = "https://plantvillage-production-new.s3.amazonaws.com/image/63694/file/default-0e281ebc682d3f01c011a93828688493.jpg",
+#                 symptoms = "Symptoms can occur at any growth stage and any part of the plant can be affected; infected leaves generally exhibit a dark green mottling or mosaic; some strains of the virus can cause yellow mottling on the leaves; young leaves may be stunted or distorted; severely infected leaves may have raised green areas; fruit yields are reduced in infected plants; green fruit may have yellow blotches or necrotic spots; dark necrotic streaks may appear on the stems, petioles leaves and fruit.",
+#                 cause = "Virus",
+#                 propagation = "ToMV is a closely related strain of Tobacco mosaic virus (TMV), it enters fields via infected weeds, peppers or potato plants; the virus may also be transmitted to tomato fields by grasshoppers, small mammals and birds.",
+#                 control = "Plant varieties that are resistant to the virus; heat treating seeds at 70°C (158°F) for 4 days or at 82–85°C (179.6–185°F) for 24 hours will help to eliminate any virus particles on the surface of the seeds; soaking seed for 15 min in 100 g/l of tri-sodium phosphate solution (TSP) can also eliminate virus particles - seeds should be rinsed thoroughly and laid out to dry after this treatment; if the virus is confirmed in the field, infected plants should be removed and destroyed to limit further spread; plant tomato on a 2-year rotation, avoiding susceptible crops such as peppers, eggplant, cucurbits and tobacco; disinfect all equipment when moving from infected areas of the field.",
+#             ),
+#             Disease(
+#                 id = 8,
+#                 name = "Tomato Yellow Leaf Curl disease",
+#                 class_index = 7,
+#                 plant_id = 1,
+#                 botanical_name = "Tomato Yellow Leaf Curl Virus (TYLCV)",
+#                 image_url = "https://plantvillage-production-new.s3.amazonaws.com/image/63702/file/default-41ffe47367c8058dd58d668669e7e677.jpg",
+#                 symptoms = "The infected leaves become reduced in size, curl upward, appear crumpled and show yellowing of veins and leaf margins. The internodes become shorter and whole plant appear stunted and bushy. The whole plant stand erect with only upright growth. The flowers may not develop and drop off.",
+#                 cause = "Virus",
+#                 propagation = "The virus is transmitted by white flies and may cause 100 % yield loss if the plants infect at early stage of crop. The virus also infect other hosts like common bean, ornamental plants and several weed species.",
+#                 control = "Grow available resistant varieties. Transplant only disease and whiteflies free seedlings. Remove the infected plants and burn them. Keep the field free from weeds. Use yellow sticky traps to monitor and control whiteflies. If the insect infestation is severe spray suitable insecticides.",
+#             ),
+#             Disease(
+#                 id = 9,
+#                 name = "Leafminers",
+#                 class_index = -1,
+#                 plant_id = 1,
+#                 botanical_name = "Tuta absoluta",
+#                 image_url = "https://plantvillage-production-new.s3.amazonaws.com/image/62538/file/default-64cefc6d20018775329221143a28779a.jpg",
+#                 symptoms = "Thin, white, winding trails on leaves; heavy mining can result in white blotches on leaves and leaves dropping from the plant prematurely; early infestation can cause fruit yield to be reduced; adult leafminer is a small black and yellow moth which lays its eggs in the leaf; larvae hatch and feed on leaf interior.",
+#                 cause = "Insect",
+#                 propagation = "Origin and distribution of Tuta absoluta: This species is originated in South American countries. Later the insect spread to Spain (2006), France, Italy, Greece, Malta, Morocco, Algeria, Libya and Turkey in following years. Further the insect has been identified in Syria, Lebanon, Jordan, Iraq, Iran, Saudi Arabia, Yemen, Oman and the rest of the Gulf states. In Africa it spreads from Egypt to Sudan, South Sudan, Ethiopia, Uganda, Kenya and Tanzania (in East) and to Senegal and Nigeria through the west. (It spread through infested fruits and packaging materials) Life cycle: Mature larvae drop from leaves into soil to pupate; entire lifecycle can take as little as 2 weeks in warm weather; insect may go through 7 to 12 generations per year. Yield loss: If unchecked, insect will cause 100% yield loss. The larvae feeds on apical buds, tender new leaflets, flowers, and green fruits which make it a serious pest in tomato. Host Range: This insect also attacks other solanaceous crops like potato, eggplant, pepino and tobacco. It is also reported on many solanaceous weeds.",
+#                 control = "Leafminer natural enemies normally keep populations under control; check transplants for signs of leafminer damage prior to planting; remove plants from soil immediately after harvest if making new plantings in same place or close by; keep the field free from weeds especially Solanum, Datura, Nicotiana; use pheromone traps and white sticky traps to monitor and control insect;only use insecticides when leafminer damage has been identified as unnecessary spraying will also reduce populations of their natural enemies.",
+#             ),
+#             Disease(
+#                 id = 10,
+#                 name = "Spider mites (Two-spotted spider mite)",
+#                 class_index = 5,
+#                 plant_id = 1,
+#                 botanical_name = "Tetranychus urticae",
+#                 image_url = "https://plantvillage-production-new.s3.amazonaws.com/image/63671/file/default-b987ce4b9e1adb0dc4278c5b7266e90b.jpg",
+#                 symptoms = "Leaves stippled with yellow; leaves may appear bronzed; webbing covering leaves; mites may be visible as tiny moving dots on the webs or underside of leaves, best viewed using a hand lens; usually not spotted until there are visible symptoms on the plant; leaves turn yellow and may drop from plant.",
+#                 cause = "Arachnid",
+#                 propagation = "Spider mites thrive in dusty conditions; water-stressed plants are more susceptible to attack.",
+#                 control = "In the home garden, spraying plants with a strong jet of water can help reduce buildup of spider mite populations; if mites become problematic apply insecticidal soap to plants; certain chemical insecticides may actually increase mite populations by killing off natural enemies and promoting mite reproduction.",
+#             )
+# ]
+# db.session.add_all(diseases)
+# db.session.commit()
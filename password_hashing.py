@@ -0,0 +1,89 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+
+class KdfOverloaded(Exception):
+    pass
+
+
+def full_method(method):
+    """`method` with the cost parameters werkzeug fills in for short forms, as it writes them into hashes."""
+    name, *args = method.split(":")
+    if name == "scrypt" and not args:
+        return "scrypt:32768:8:1"
+    if name == "pbkdf2" and len(args) < 2:
+        return f"pbkdf2:{args[0] if args else 'sha256'}:{DEFAULT_PBKDF2_ITERATIONS}"
+    return method
+
+
+class KdfPool:
+    """Runs password hashing in a small process pool so it never holds the request threads' GIL.
+
+    At most `workers + max_pending` hashes may be running or queued at once;
+    beyond that `hash`/`verify` raise KdfOverloaded straight away instead of
+    queueing. `method` is a werkzeug method string; short forms such as
+    "scrypt" are expanded to the full string werkzeug stores (e.g.
+    "scrypt:32768:8:1") so that `needs_rehash` only flags hashes made with
+    other parameters.
+    """
+
+    def __init__(self, workers=2, max_pending=32, method="scrypt:32768:8:1", salt_length=16, timeout=10):
+        self.workers = workers
+        self.method = full_method(method)
+        self.salt_length = salt_length
+        self.timeout = timeout
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, stored_hash, password):
+        return self._run(check_password_hash, stored_hash, password)
+
+    async def hash_async(self, password):
+        return await self._run_async(generate_password_hash, password, self.method, self.salt_length)
+
+    async def verify_async(self, stored_hash, password):
+        return await self._run_async(check_password_hash, stored_hash, password)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None and self._pid == os.getpid():
+                self._executor.shutdown()
+            self._executor = None
+
+    def needs_rehash(self, stored_hash):
+        return stored_hash.split("$", 1)[0] != self.method
+
+    def _run(self, fn, *args):
+        return self._submit(fn, *args).result(timeout=self.timeout)
+
+    async def _run_async(self, fn, *args):
+        return await asyncio.wait_for(asyncio.wrap_future(self._submit(fn, *args)), self.timeout)
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            raise KdfOverloaded()
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # Keep the slot until the work is actually done, even if we stop waiting for it.
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def _get_executor(self):
+        # Created lazily, and again after a fork, so pre-forking servers get one pool per worker.
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                self._pid = os.getpid()
+            return self._executor
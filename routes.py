@@ -0,0 +1,664 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from datetime import date, datetime, timezone
+from functools import wraps
+import json
+from flask import Blueprint, Response, current_app, g, jsonify, request, stream_with_context
+from sqlalchemy import select, update
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import load_only
+from werkzeug.local import LocalProxy
+
+from catalog_sync import can_sync, catalog_versions, changed_records, delta_payload, snapshot_payload
+from history_stats import stat_deltas, stats_statement, stats_upsert_statement, user_history_lock
+from models import Disease, History, Plant, User, db, dialect_insert, utc_isoformat
+from password_hashing import KdfOverloaded
+from serialization import dumps_json, encode_payload, response_format
+from tokens import TokenError
+
+api = Blueprint("api", __name__)
+
+# Per-app services created by create_app()
+catalog_cache = LocalProxy(lambda: current_app.extensions["catalog_cache"])
+disease_index = LocalProxy(lambda: current_app.extensions["disease_index"])
+kdf_pool = LocalProxy(lambda: current_app.extensions["kdf_pool"])
+metrics = LocalProxy(lambda: current_app.extensions["metrics"])
+token_service = LocalProxy(lambda: current_app.extensions["token_service"])
+search_backend = LocalProxy(lambda: current_app.extensions["search"])
+
+def parse_timestamp(value):
+    """Parse an ISO 8601 string into an aware UTC datetime; naive values are taken as UTC."""
+    timestamp = datetime.fromisoformat(value)
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp.astimezone(timezone.utc)
+
+def encode_cursor(timestamp):
+    return urlsafe_b64encode(utc_isoformat(timestamp).encode()).decode().rstrip("=")
+
+def decode_cursor(cursor):
+    try:
+        value = urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError(f"Invalid cursor: {cursor}")
+    return parse_timestamp(value)
+
+def history_page_statement(user_id, limit, after_date=None, before_date=None, fields=None):
+    """Select one page of a user's history plus one extra row to tell whether more follow.
+
+    With `fields`, only those columns (and the primary key) are loaded.
+    """
+    statement = select(History).where(History.user_id == user_id)
+    if fields is not None:
+        statement = statement.options(load_only(*[getattr(History, field) for field in fields]))
+    if before_date is not None:
+        statement = statement.where(History.date > before_date).order_by(History.date.asc())
+    else:
+        if after_date is not None:
+            statement = statement.where(History.date < after_date)
+        statement = statement.order_by(History.date.desc())
+    return statement.limit(limit + 1)
+
+def history_page(rows, limit, after_date=None, before_date=None):
+    """Turn the rows from `history_page_statement` into (page newest-first, next_cursor, prev_cursor)."""
+    rows = list(rows)
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if before_date is not None:
+        rows.reverse()
+
+    has_older = has_more if before_date is None else True
+    has_newer = after_date is not None if before_date is None else has_more
+    next_cursor = encode_cursor(rows[-1].date) if rows and has_older else None
+    prev_cursor = encode_cursor(rows[0].date) if rows and has_newer else None
+    return rows, next_cursor, prev_cursor
+
+def is_int(value):
+    """True for JSON integers; bool is an int subclass but not one."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+def history_row(item, user_id):
+    """Validate one history record from a request body and return insertable column values."""
+    if not isinstance(item, dict):
+        raise ValueError("Expected a JSON object")
+    missing = [field for field in ("predicted_class_id", "local_url", "remote_url", "date") if field not in item]
+    if missing:
+        raise ValueError(f"Missing fields: {', '.join(missing)}")
+    if "user_id" in item and item["user_id"] != user_id:
+        raise ValueError("user_id does not match the authenticated user")
+    # local_url is unique across all users, so no coercion here
+    if not is_int(item["predicted_class_id"]):
+        raise ValueError("predicted_class_id must be an integer")
+    for field in ("local_url", "remote_url", "date"):
+        if not isinstance(item[field], str):
+            raise ValueError(f"{field} must be a string")
+    return {
+        "user_id": user_id,
+        "predicted_class_id": item["predicted_class_id"],
+        "local_url": item["local_url"],
+        "remote_url": item["remote_url"],
+        "date": parse_timestamp(item["date"]),
+    }
+
+def read_batch_items():
+    """Yield (item, error) pairs from a JSON array body or an NDJSON stream, one per record."""
+    if request.mimetype in ("application/x-ndjson", "application/jsonl"):
+        for line in request.stream:
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line), None
+            except ValueError as e:
+                yield None, f"Invalid JSON: {e}"
+        return
+
+    items = request.get_json(silent=True)
+    if items is None:
+        raise ValueError("Body is not valid JSON")
+    if not isinstance(items, list):
+        raise ValueError("Expected a JSON array of history records")
+    for item in items:
+        yield item, None
+
+def history_upsert_statement():
+    """INSERT ... ON CONFLICT (user_id, date) DO UPDATE for the current database."""
+    statement = dialect_insert(History.__table__, db.engine.dialect.name)
+    return statement.on_conflict_do_update(
+        index_elements=["user_id", "date"],
+        set_={column: statement.excluded[column] for column in ("predicted_class_id", "local_url", "remote_url")},
+    )
+
+def login_required(view):
+    """Authenticate the request from its Bearer access token and put the user id in `g.user_id`."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+        if scheme.lower() != "bearer" or not token:
+            return jsonify({"message": "Missing access token"}), 401, {"WWW-Authenticate": "Bearer"}
+        try:
+            g.user_id = token_service.verify(token)
+        except TokenError as e:
+            return jsonify({"message": str(e)}), 401, {"WWW-Authenticate": "Bearer"}
+        return view(*args, **kwargs)
+    return wrapper
+
+def kdf_overloaded_response():
+    return jsonify({"message": "Server busy, try again shortly"}), 503, {"Retry-After": "1"}
+
+PUBLIC_USER_FIELDS = ("id", "first_name", "last_name", "email")
+
+def requested_fields(allowed):
+    """Return the columns named by `?fields=` in request order, or None for all of them."""
+    value = request.args.get('fields')
+    if not value:
+        return None
+    fields = list(dict.fromkeys(field.strip() for field in value.split(',') if field.strip()))
+    unknown = [field for field in fields if field not in allowed]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+def project(item, fields):
+    """Serialize the given attributes of a model instance."""
+    values = {field: getattr(item, field) for field in fields}
+    return {field: utc_isoformat(value) if isinstance(value, datetime) else value for field, value in values.items()}
+
+def iter_users(after_id=None, limit=None, fields=None):
+    """Yield lists of public user dicts ordered by id, fetched `USERS_EXPORT_CHUNK_SIZE` rows at a time.
+
+    Only the public columns (or the requested subset of them, plus id) are
+    selected, so password hashes are never loaded.
+    """
+    fields = fields or PUBLIC_USER_FIELDS
+    columns = [User.id] + [getattr(User, field) for field in fields if field != "id"]
+    query = select(*columns).order_by(User.id)
+    if after_id is not None:
+        query = query.where(User.id > after_id)
+    if limit is not None:
+        query = query.limit(limit)
+
+    chunk_size = current_app.config["USERS_EXPORT_CHUNK_SIZE"]
+    result = db.session.execute(query.execution_options(yield_per=chunk_size))
+    for rows in result.partitions():
+        yield [row._asdict() for row in rows]
+
+def json_error(message, status=400):
+    return jsonify({"message": message}), status
+
+@api.route("/")
+def index():
+    return "PlantDoc!!!"
+
+@api.route("/metrics")
+def get_metrics():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@api.route("/users/create", methods=["POST"])
+def create_user():
+    error = False
+    try: 
+        first_name = request.get_json()['first_name']
+        last_name = request.get_json()['last_name']
+        email = request.get_json()['email']
+        password = request.get_json()['password']
+
+        # Check if user exists
+        if User.query.filter_by(email=email).first():
+            return jsonify({"message": "Email already exists"}), 409
+        # Hand the connection back to the pool while the hash is queued and computed
+        db.session.rollback()
+
+        with metrics.kdf_seconds.time(operation="hash"):
+            hashed_password = kdf_pool.hash(password)
+       
+        # Add user to db
+        user = User(first_name=first_name, last_name=last_name, email=email, password=hashed_password)
+        db.session.add(user)
+        db.session.commit()
+
+        # Return added user
+        added_user = [user.to_public_dict() for user in User.query.filter_by(email=email).all()]
+        return jsonify({"message": "success", "data" : added_user})
+    except (KdfOverloaded, TimeoutError):
+        return kdf_overloaded_response()
+
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.exception("Database error")
+        return jsonify({"message": "Database error", "error": str(e)}), 500
+
+    except Exception as e:
+        current_app.logger.exception("Unexpected error")
+        return jsonify({"message": "An unexpected error occurred", "error": str(e)}), 500     
+
+@api.route("/login", methods=["POST"])
+def login():
+    try: 
+        email = request.form.get('email')
+        password = request.form.get('password')
+
+        # Check if user exists
+        user = User.query.filter_by(email=email).first()
+        if user is None:
+            return jsonify({"message": "Unregistered email"}), 404
+        
+        stored_password_hash = user.password
+        user_id = user.id
+        public_user = user.to_public_dict()
+        # Hand the connection back to the pool while the KDF is queued and computed
+        db.session.rollback()
+
+        if stored_password_hash is None:
+            return jsonify({"message": "Wrong password"}), 401
+        with metrics.kdf_seconds.time(operation="verify"):
+            password_matches = kdf_pool.verify(stored_password_hash, password)
+        if not password_matches:
+            return jsonify({"message": "Wrong password"}), 401
+
+        # Upgrade hashes made with outdated parameters while we have the plaintext
+        if kdf_pool.needs_rehash(stored_password_hash):
+            try:
+                with metrics.kdf_seconds.time(operation="rehash"):
+                    new_password_hash = kdf_pool.hash(password)
+                db.session.execute(update(User).where(User.id == user_id).values(password=new_password_hash))
+                db.session.commit()
+            except (KdfOverloaded, TimeoutError):
+                pass
+
+        # Return added user
+        added_user = [public_user]
+        return jsonify({"message": "success", "data" : added_user, **token_service.issue(user_id)})
+        
+    except (KdfOverloaded, TimeoutError):
+        return kdf_overloaded_response()
+
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.exception("Database error")
+        return jsonify({"message": "Database error", "error": str(e)}), 500
+
+    except Exception as e:
+        current_app.logger.exception("Unexpected error")
+        return jsonify({"message": "An unexpected error occurred", "error": str(e)}), 500
+
+@api.route("/token/refresh", methods=["POST"])
+def refresh_token():
+    refresh_token = (request.get_json(silent=True) or request.form).get('refresh_token')
+    if not refresh_token:
+        return jsonify({"message": "Missing refresh token"}), 400
+    try:
+        return jsonify({"message": "success", **token_service.refresh(refresh_token)})
+    except TokenError as e:
+        return jsonify({"message": str(e)}), 401
+
+@api.route("/logout", methods=["POST"])
+@login_required
+def logout():
+    token_service.revoke(request.headers["Authorization"].partition(" ")[2])
+    refresh_token = (request.get_json(silent=True) or request.form).get('refresh_token')
+    if refresh_token:
+        token_service.revoke(refresh_token, "refresh")
+    return jsonify({"message": "success"})
+
+@api.route("/users", methods=["GET"])
+def get_users():
+    """List users.
+
+    `stream=ndjson` or `stream=json` streams every user (from `after_id`, up to
+    `limit` if given) in bounded memory. Passing only `after_id`/`limit`
+    returns one keyset page with a `next_after_id` to continue from.
+    `fields` limits the columns returned. The password column is never loaded.
+    """
+    stream = request.args.get('stream')
+    after_id = request.args.get('after_id', type=int)
+    limit = request.args.get('limit', type=int)
+    # Checked up front: once a stream has started, errors can no longer change the 200
+    if limit is not None and limit < 1:
+        return json_error("limit must be at least 1")
+    if after_id is not None and after_id < 0:
+        return json_error("after_id must not be negative")
+    try:
+        fields = requested_fields(PUBLIC_USER_FIELDS)
+    except ValueError as e:
+        return json_error(str(e))
+
+    if stream == "ndjson":
+        def generate():
+            for users in iter_users(after_id, limit, fields):
+                yield b"".join(dumps_json(user) + b"\n" for user in users)
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    if stream == "json":
+        def generate():
+            yield b'{"message":"success","data":['
+            separator = b""
+            for users in iter_users(after_id, limit, fields):
+                yield separator + b",".join(dumps_json(user) for user in users)
+                separator = b","
+            yield b"]}"
+        return Response(stream_with_context(generate()), mimetype="application/json")
+
+    if stream is not None:
+        return jsonify({"message": "stream must be json or ndjson"}), 400
+
+    if after_id is not None or limit is not None:
+        limit = max(1, min(limit or current_app.config["USERS_PAGE_SIZE"], current_app.config["USERS_MAX_PAGE_SIZE"]))
+        users = [user for chunk in iter_users(after_id, limit + 1, fields) for user in chunk]
+        has_more = len(users) > limit
+        users = users[:limit]
+        return jsonify({"message": "success", "data": users,
+                        "next_after_id": users[-1]["id"] if has_more else None})
+
+    users = [user for chunk in iter_users(fields=fields) for user in chunk]
+    return jsonify({"message": "success", "data" : users})
+
+def catalog_response(name, model):
+    """Serve a catalog listing from the cache, one entry per (fields, format), precompressed when large."""
+    try:
+        fields = requested_fields(model.__table__.columns.keys())
+    except ValueError as e:
+        return json_error(str(e))
+    format = response_format()
+
+    def build():
+        if fields is None:
+            items = [item.to_dict() for item in model.query.all()]
+        else:
+            items = [row._asdict() for row in db.session.execute(select(*[getattr(model, field) for field in fields]))]
+        return encode_payload({"message": "success", "data": items}, format)
+
+    return cached_response(f"{name}:{format}:{','.join(fields) if fields else '*'}", build)
+
+def cached_response(key, build):
+    """Respond with the catalog cache entry for `key`, conditional and in the best accepted encoding."""
+    entry = catalog_cache.get_or_build(key, build)
+    encoding = request.accept_encodings.best_match(list(entry.encoded)) if entry.encoded else None
+
+    response = Response(entry.encoded[encoding] if encoding else entry.body, mimetype=entry.mimetype)
+    if encoding:
+        response.content_encoding = encoding
+    response.vary.update(("Accept", "Accept-Encoding"))
+    response.set_etag(f"{entry.etag}-{encoding}" if encoding else entry.etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+@api.route("/plants", methods=["GET"])
+def get_plants():
+    return catalog_response("plants", Plant)
+
+@api.route("/diseases", methods=["GET"])
+def get_diseases():
+    return catalog_response("diseases", Disease)
+
+@api.route("/sync", methods=["GET"])
+def sync_catalog():
+    """Plants and diseases changed since the client's catalog version `since`.
+
+    Changed rows come back whole under "upserted", removed ones as ids under
+    "deleted", along with the version to send next time. Without `since`, or
+    when the client is too far behind (its changes were pruned, or more than
+    SYNC_MAX_CHANGES rows changed), the response is a full snapshot instead,
+    marked "full": true, and the client should drop rows it doesn't list.
+    """
+    since = request.args.get('since', 0, type=int)
+    try:
+        oldest, current = catalog_versions(db.session)
+        if since and since == current:
+            return jsonify(delta_payload(db.session, current, {}))
+        if can_sync(since, oldest, current):
+            changed = changed_records(db.session, since, current_app.config["SYNC_MAX_CHANGES"])
+            if changed is not None:
+                return jsonify(delta_payload(db.session, current, changed))
+
+        format = response_format()
+        return cached_response(f"sync:{format}", lambda: encode_payload(snapshot_payload(db.session), format))
+    except SQLAlchemyError:
+        db.session.rollback()
+        current_app.logger.exception("Database error")
+        return jsonify({"message": "Database error"}), 500
+
+@api.route("/diseases/by-class/<int(signed=True):class_index>", methods=["GET"])
+def get_diseases_by_class(class_index):
+    plant_id = request.args.get('plant_id', type=int)
+    diseases = disease_index.get().lookup(class_index, plant_id)
+    if not diseases:
+        return jsonify({"message": "No disease for class index"}), 404
+    return jsonify({"message": "success", "data": [dict(disease) for disease in diseases]})
+
+@api.route("/diseases/resolve", methods=["POST"])
+def resolve_diseases():
+    """Resolve a list of class indices to diseases in one call; unknown indices resolve to null."""
+    body = request.get_json(silent=True)
+    if not isinstance(body, dict):
+        return jsonify({"message": "Expected a JSON object"}), 400
+    class_indices = body.get('class_indices')
+    if not isinstance(class_indices, list) or not all(is_int(i) for i in class_indices):
+        return jsonify({"message": "class_indices must be a list of integers"}), 400
+    plant_id = body.get('plant_id')
+    if plant_id is not None and not is_int(plant_id):
+        return jsonify({"message": "plant_id must be an integer or null"}), 400
+
+    index = disease_index.get()
+    resolved = []
+    for class_index in class_indices:
+        disease = index.resolve(class_index, plant_id)
+        resolved.append({"class_index": class_index, "disease": dict(disease) if disease else None})
+    return jsonify({"message": "success", "data": resolved})
+
+@api.route("/search", methods=["GET"])
+def search():
+    """Ranked full-text search over plant and disease text.
+
+    `q` is matched word by word, each word also matching longer words it
+    prefixes. `plant_id` and `type` (plant or disease) filter the hits.
+    """
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify({"message": "Missing search query"}), 400
+    kind = request.args.get('type')
+    if kind not in (None, "plant", "disease"):
+        return jsonify({"message": "type must be plant or disease"}), 400
+    limit = request.args.get('limit', 20, type=int)
+    limit = max(1, min(limit, current_app.config["SEARCH_MAX_RESULTS"]))
+
+    try:
+        results = search_backend.search(query, request.args.get('plant_id', type=int), kind, limit)
+        return jsonify({"message": "success", "data": results})
+    except SQLAlchemyError:
+        db.session.rollback()
+        current_app.logger.exception("Database error")
+        return jsonify({"message": "Database error"}), 500
+
+@api.route("/history", methods=["GET"])
+@login_required
+def get_user_history():
+    """Return the authenticated user's history newest-first, one page at a time.
+
+    `after` continues towards older entries and `before` goes back towards
+    newer ones; both take a cursor from a previous response. Since date is
+    unique per user, the cursor is just the boundary row's timestamp.
+    `expand=disease` embeds each entry's resolved disease from the in-memory
+    index, and `fields` limits the columns loaded and returned.
+    """
+    try:
+        user_id = g.user_id
+        expand_disease = "disease" in request.args.get('expand', '').split(',')
+        limit = request.args.get('limit', current_app.config["HISTORY_PAGE_SIZE"], type=int)
+        limit = max(1, min(limit, current_app.config["HISTORY_MAX_PAGE_SIZE"]))
+        after = request.args.get('after')
+        before = request.args.get('before')
+
+        try:
+            after_date = decode_cursor(after) if after else None
+            before_date = decode_cursor(before) if before else None
+        except ValueError as e:
+            return jsonify({"message": "Invalid cursor", "error": str(e)}), 400
+        try:
+            fields = requested_fields(History.__table__.columns.keys())
+        except ValueError as e:
+            return json_error(str(e))
+
+        loaded = fields
+        if fields is not None and expand_disease and "predicted_class_id" not in fields:
+            loaded = fields + ["predicted_class_id"]
+        statement = history_page_statement(user_id, limit, after_date, before_date, loaded)
+        user_history, next_cursor, prev_cursor = history_page(db.session.scalars(statement).all(),
+                                                              limit, after_date, before_date)
+
+        if fields is None:
+            history_data = [history.to_dict() for history in user_history]
+        else:
+            history_data = [project(history, fields) for history in user_history]
+        if expand_disease:
+            index = disease_index.get()
+            for item, history in zip(history_data, user_history):
+                disease = index.resolve(history.predicted_class_id)
+                item["disease"] = dict(disease) if disease else None
+
+        return jsonify({"message": "success", "data": history_data,
+                        "next_cursor": next_cursor, "prev_cursor": prev_cursor})
+
+    except Exception as e:
+        return jsonify({"message": "An unexpected error occurred", "error": str(e)}), 500
+
+@api.route("/history/create", methods=["POST"])
+@login_required
+def create_history():
+    error = False
+    try: 
+        user_id = g.user_id
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict):
+            return jsonify({"message": "Invalid request body", "error": "Expected a JSON object"}), 400
+        if body.get('user_id', user_id) != user_id:
+            return jsonify({"message": "user_id does not match the authenticated user"}), 403
+        try:
+            row = history_row(body, user_id)
+        except ValueError as e:
+            return jsonify({"message": "Invalid request body", "error": str(e)}), 400
+       
+        # Add user to db
+        history = History(**row)
+        
+        db.session.execute(user_history_lock(db.engine.dialect.name, user_id))
+        db.session.add(history)
+        db.session.execute(stats_upsert_statement(db.engine.dialect.name), stat_deltas([row]))
+        db.session.commit()
+
+        # Return added user
+        added_history = [history.to_dict() for history in History.query.filter_by(user_id=user_id).filter_by(date=row["date"]).all()]
+        return jsonify({"message": "success", "data" : added_history})
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.exception("Database error")
+        return jsonify({"message": "Database error", "error": str(e)}), 500
+
+    except Exception as e:
+        current_app.logger.exception("Unexpected error")
+        return jsonify({"message": "An unexpected error occurred", "error": str(e)}), 500
+
+@api.route("/history/batch", methods=["POST"])
+@login_required
+def create_history_batch():
+    """Upsert many of the authenticated user's history records in one transaction.
+
+    Accepts a JSON array or an NDJSON stream (Content-Type: application/x-ndjson).
+    Records are keyed on (user_id, date), so replaying a batch is harmless. Each
+    record gets a status in the response, in request order: "ok", "error", or
+    "duplicate" when a later record in the same batch has the same key or
+    local_url, or the local_url is already stored under another key.
+    """
+    try:
+        results = []
+        rows = {}
+        urls = {}
+        for index, (item, error) in enumerate(read_batch_items()):
+            if index >= current_app.config["HISTORY_BATCH_MAX_ITEMS"]:
+                return jsonify({"message": f"Batches are limited to {current_app.config['HISTORY_BATCH_MAX_ITEMS']} records"}), 413
+            if error is None:
+                try:
+                    row = history_row(item, g.user_id)
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                results.append({"index": index, "status": "error", "error": error})
+                continue
+
+            key = (row["user_id"], row["date"])
+            for superseded in {key, urls.get(row["local_url"])} & rows.keys():
+                result_index, previous = rows.pop(superseded)
+                results[result_index]["status"] = "duplicate"
+                urls.pop(previous["local_url"])
+            rows[key] = (len(results), row)
+            urls[row["local_url"]] = key
+            results.append({"index": index, "status": "ok"})
+
+        # local_url is unique too: skip records whose URL is already stored under another
+        # key (e.g. a replayed scan with a re-serialized date) rather than fail the batch
+        if urls:
+            stored = db.session.execute(select(History.local_url, History.user_id, History.date)
+                                        .where(History.local_url.in_(list(urls)))).all()
+            for local_url, user_id, stored_date in stored:
+                if stored_date.tzinfo is None:
+                    stored_date = stored_date.replace(tzinfo=timezone.utc)
+                if (user_id, stored_date.astimezone(timezone.utc)) != urls[local_url]:
+                    result_index, _ = rows.pop(urls[local_url])
+                    results[result_index].update(status="duplicate", error="local_url is already recorded")
+
+        if rows:
+            # Overwritten rows move out of their old buckets. Under the user's lock no other
+            # writer can add or change one of these rows between this read and our commit.
+            db.session.execute(user_history_lock(db.engine.dialect.name, g.user_id))
+            replaced = db.session.execute(
+                select(History.user_id, History.predicted_class_id, History.date)
+                .where(History.user_id == g.user_id, History.date.in_([timestamp for _, timestamp in rows]))
+            ).all()
+            written = [row for _, row in rows.values()]
+            db.session.execute(history_upsert_statement(), written)
+            deltas = stat_deltas(written, replaced)
+            if deltas:
+                db.session.execute(stats_upsert_statement(db.engine.dialect.name), deltas)
+            db.session.commit()
+
+        return jsonify({"message": "success", "data": results})
+    except ValueError as e:
+        return jsonify({"message": "Invalid request body", "error": str(e)}), 400
+
+    except SQLAlchemyError as e:
+        db.session.rollback()
+        current_app.logger.exception("Database error")
+        return jsonify({"message": "Database error", "error": str(e)}), 500
+
+    except Exception as e:
+        current_app.logger.exception("Unexpected error")
+        return jsonify({"message": "An unexpected error occurred", "error": str(e)}), 500
+
+@api.route("/history/stats", methods=["GET"])
+@login_required
+def get_history_stats():
+    """Diagnosis counts per day and predicted class, from the history_stat counters.
+
+    `scope=all` counts every user's history instead of the caller's. `from`
+    and `to` are inclusive ISO dates (UTC days), `class_id` keeps one class,
+    and `interval=total` sums each class over the whole range.
+    """
+    scope = request.args.get('scope', 'user')
+    if scope not in ("user", "all"):
+        return json_error("scope must be user or all")
+    interval = request.args.get('interval', 'day')
+    if interval not in ("day", "total"):
+        return json_error("interval must be day or total")
+    try:
+        start = date.fromisoformat(request.args['from']) if 'from' in request.args else None
+        end = date.fromisoformat(request.args['to']) if 'to' in request.args else None
+    except ValueError as e:
+        return json_error(f"Invalid date: {e}")
+
+    try:
+        statement = stats_statement(g.user_id if scope == "user" else None, start, end,
+                                    request.args.get('class_id', type=int), per_day=interval == "day")
+        data = [dict(row._mapping) for row in db.session.execute(statement)]
+        return jsonify({"message": "success", "data": data, "total": sum(item["count"] for item in data)})
+    except SQLAlchemyError:
+        db.session.rollback()
+        current_app.logger.exception("Database error")
+        return jsonify({"message": "Database error"}), 500
@@ -0,0 +1,194 @@
+import math
+import re
+import threading
+import time
+from bisect import bisect_left, insort
+
+from sqlalchemy import text
+
+TOKEN = re.compile(r"[a-z0-9]+")
+STOPWORDS = frozenset(("a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "into", "is", "it",
+                       "its", "of", "on", "or", "that", "the", "their", "this", "to", "was", "which", "with"))
+
+# Field weights: a match in a name counts as several matches in body text
+FIELDS = {
+    "plant": {"name": 3, "botanical_name": 2, "general_info": 1},
+    "disease": {"name": 3, "botanical_name": 2, "symptoms": 1, "cause": 1, "propagation": 1, "control": 1},
+}
+PREFIX_WEIGHT = 0.5
+MAX_PREFIX_EXPANSIONS = 50
+
+
+def normalize(token):
+    if len(token) > 4 and token.endswith("ies"):
+        return token[:-3] + "y"
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(value):
+    return [normalize(token) for token in TOKEN.findall(value.lower()) if token not in STOPWORDS]
+
+
+class InvertedIndex:
+    """In-memory BM25 index over plant and disease text.
+
+    Documents are keyed by (type, id). Every query term also matches
+    vocabulary terms it is a prefix of, at PREFIX_WEIGHT. Adding or removing
+    a document only touches that document's postings.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self._postings = {}
+        self._vocabulary = []
+        self._documents = {}
+        self._total_length = 0
+        self._lock = threading.RLock()
+
+    def __len__(self):
+        return len(self._documents)
+
+    def add(self, kind, record):
+        terms = {}
+        for field, weight in FIELDS[kind].items():
+            for term in tokenize(record.get(field) or ""):
+                terms[term] = terms.get(term, 0) + weight
+        length = sum(terms.values())
+        plant_id = record["id"] if kind == "plant" else record["plant_id"]
+        key = (kind, record["id"])
+
+        with self._lock:
+            self._remove(key)
+            self._documents[key] = {"type": kind, "id": record["id"], "plant_id": plant_id,
+                                    "name": record["name"], "terms": terms, "length": length}
+            self._total_length += length
+            for term, frequency in terms.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    insort(self._vocabulary, term)
+                postings[key] = frequency
+
+    def remove(self, kind, id):
+        with self._lock:
+            self._remove((kind, id))
+
+    def search(self, query, plant_id=None, kind=None, limit=20):
+        with self._lock:
+            if not self._documents:
+                return []
+            average_length = self._total_length / len(self._documents)
+            scores = {}
+            for query_term in set(tokenize(query)):
+                for term, weight in self._expand(query_term):
+                    postings = self._postings[term]
+                    idf = math.log(1 + (len(self._documents) - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for key, frequency in postings.items():
+                        document = self._documents[key]
+                        if plant_id is not None and document["plant_id"] != plant_id:
+                            continue
+                        if kind is not None and document["type"] != kind:
+                            continue
+                        norm = self.k1 * (1 - self.b + self.b * document["length"] / average_length)
+                        scores[key] = scores.get(key, 0) + weight * idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:limit]
+            return [{"type": self._documents[key]["type"], "id": self._documents[key]["id"],
+                     "plant_id": self._documents[key]["plant_id"], "name": self._documents[key]["name"],
+                     "score": round(score, 4)} for key, score in ranked]
+
+    def _expand(self, query_term):
+        start = bisect_left(self._vocabulary, query_term)
+        expansions = []
+        for term in self._vocabulary[start:start + MAX_PREFIX_EXPANSIONS]:
+            if not term.startswith(query_term):
+                break
+            expansions.append((term, 1.0 if term == query_term else PREFIX_WEIGHT))
+        return expansions
+
+    def _remove(self, key):
+        document = self._documents.pop(key, None)
+        if document is None:
+            return
+        self._total_length -= document["length"]
+        for term in document["terms"]:
+            postings = self._postings[term]
+            del postings[key]
+            if not postings:
+                del self._postings[term]
+                del self._vocabulary[bisect_left(self._vocabulary, term)]
+
+
+class MemorySearch:
+    """Lazily built InvertedIndex, kept current by `apply` and fully rebuilt every `ttl` seconds."""
+
+    def __init__(self, load, ttl=300):
+        self.load = load
+        self.ttl = ttl
+        self._index = None
+        self._expires_at = 0
+        self._lock = threading.Lock()
+
+    def search(self, query, plant_id=None, kind=None, limit=20):
+        return self._get().search(query, plant_id, kind, limit)
+
+    def apply(self, changes):
+        """Apply committed catalog changes: (kind, id, record) tuples, record None for deletes."""
+        index = self._index
+        if index is None:
+            return
+        for kind, id, record in changes:
+            if record is None:
+                index.remove(kind, id)
+            else:
+                index.add(kind, record)
+
+    def _get(self):
+        if self._index is not None and self._expires_at > time.monotonic():
+            return self._index
+        with self._lock:
+            if self._index is None or self._expires_at <= time.monotonic():
+                index = InvertedIndex()
+                for kind, record in self.load():
+                    index.add(kind, record)
+                self._index = index
+                self._expires_at = time.monotonic() + self.ttl
+            return self._index
+
+
+class PostgresSearch:
+    """Full-text search on the `search_vector` tsvector columns (GIN-indexed) added by migration."""
+
+    QUERY = text("""
+        SELECT * FROM (
+            SELECT 'disease' AS type, id, plant_id, name, ts_rank_cd(search_vector, query) AS score
+            FROM disease, to_tsquery('english', :query) AS query
+            WHERE search_vector @@ query AND (:plant_id IS NULL OR plant_id = :plant_id)
+            UNION ALL
+            SELECT 'plant' AS type, id, id AS plant_id, name, ts_rank_cd(search_vector, query) AS score
+            FROM plant, to_tsquery('english', :query) AS query
+            WHERE search_vector @@ query AND (:plant_id IS NULL OR id = :plant_id)
+        ) AS hits
+        WHERE :kind IS NULL OR type = :kind
+        ORDER BY score DESC, type, id
+        LIMIT :limit
+    """)
+
+    def __init__(self, session):
+        self.session = session
+
+    def search(self, query, plant_id=None, kind=None, limit=20):
+        # Tokens are [a-z0-9]+ only, so they are safe to splice into tsquery syntax
+        terms = [f"{token}:*" for token in TOKEN.findall(query.lower()) if token not in STOPWORDS]
+        if not terms:
+            return []
+        rows = self.session.execute(self.QUERY, {"query": " | ".join(terms), "plant_id": plant_id,
+                                                 "kind": kind, "limit": limit})
+        return [{"type": row.type, "id": row.id, "plant_id": row.plant_id, "name": row.name,
+                 "score": round(float(row.score), 4)} for row in rows]
+
+    def apply(self, changes):
+        pass
@@ -0,0 +1,65 @@
+"""Response encoding: orjson for JSON when installed, MessagePack for clients that ask for it."""
+import json
+from datetime import date, datetime
+
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the standard library
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional, MessagePack is only offered when installed
+    msgpack = None
+
+JSON_MIMETYPE = "application/json"
+MSGPACK_MIMETYPE = "application/msgpack"
+MSGPACK_MIMETYPES = (MSGPACK_MIMETYPE, "application/x-msgpack")
+
+
+def default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not serializable")
+
+
+def dumps_json(payload):
+    """Compact JSON bytes."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=default, separators=(",", ":")).encode()
+
+
+def response_format():
+    """"msgpack" if the request prefers MessagePack and it's available, else "json"."""
+    if msgpack is None:
+        return "json"
+    best = request.accept_mimetypes.best_match((JSON_MIMETYPE,) + MSGPACK_MIMETYPES, default=JSON_MIMETYPE)
+    return "msgpack" if best in MSGPACK_MIMETYPES else "json"
+
+
+def encode_payload(payload, format):
+    """Return (body bytes, mimetype) for `payload` in the given response format."""
+    if format == "msgpack":
+        return msgpack.packb(payload, default=default), MSGPACK_MIMETYPE
+    return dumps_json(payload), JSON_MIMETYPE
+
+
+class NegotiatingJSONProvider(DefaultJSONProvider):
+    """JSON provider behind jsonify() that encodes with orjson and answers MessagePack requests.
+
+    Only `response()` is overridden; `dumps`/`loads` keep the standard
+    behaviour for code that passes json module options.
+    """
+
+    def response(self, *args, **kwargs):
+        payload = self._prepare_response_obj(args, kwargs)
+        body, mimetype = encode_payload(payload, response_format())
+        response = self._app.response_class(body, mimetype=mimetype)
+        if msgpack is not None:
+            # The body depends on Accept, even when this request got JSON
+            response.vary.add("Accept")
+        return response
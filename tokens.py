@@ -0,0 +1,90 @@
+import threading
+import time
+import uuid
+
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+
+
+class TokenError(Exception):
+    pass
+
+
+class RevocationList:
+    """Token ids revoked before their expiry, kept in memory until they would have expired anyway."""
+
+    def __init__(self):
+        self._expiries = {}
+        self._lock = threading.Lock()
+        self._next_purge = 0
+
+    def add(self, jti, expires_at):
+        with self._lock:
+            self._expiries[jti] = expires_at
+            self._purge()
+
+    def __contains__(self, jti):
+        return jti in self._expiries
+
+    def _purge(self):
+        now = time.time()
+        if now < self._next_purge:
+            return
+        self._expiries = {jti: expiry for jti, expiry in self._expiries.items() if expiry > now}
+        self._next_purge = now + 60
+
+
+class TokenService:
+    """Stateless signed access/refresh tokens.
+
+    Checking an access token is an HMAC check plus a dict lookup in the
+    revocation list, with no database or KDF work. Revocations are per process,
+    so with several workers a revoked token is rejected reliably only once it
+    expires. Keep ACCESS_TOKEN_TTL short.
+    """
+
+    def __init__(self, secret_key, access_ttl=900, refresh_ttl=30 * 24 * 3600):
+        self.access_ttl = access_ttl
+        self.refresh_ttl = refresh_ttl
+        self.revoked = RevocationList()
+        self._serializers = {
+            "access": URLSafeTimedSerializer(secret_key, salt="plantdoc-access"),
+            "refresh": URLSafeTimedSerializer(secret_key, salt="plantdoc-refresh"),
+        }
+
+    def issue(self, user_id):
+        return {
+            "access_token": self._dump("access", user_id),
+            "refresh_token": self._dump("refresh", user_id),
+            "token_type": "Bearer",
+            "expires_in": self.access_ttl,
+        }
+
+    def verify(self, token, kind="access"):
+        """Return the user id a valid token was issued for, or raise TokenError."""
+        max_age = self.access_ttl if kind == "access" else self.refresh_ttl
+        try:
+            payload = self._serializers[kind].loads(token, max_age=max_age)
+        except SignatureExpired:
+            raise TokenError("Token expired")
+        except BadSignature:
+            raise TokenError("Invalid token")
+        if payload["jti"] in self.revoked:
+            raise TokenError("Token revoked")
+        return payload["sub"]
+
+    def refresh(self, refresh_token):
+        """Exchange a refresh token for a new token pair; the old refresh token stops working."""
+        user_id = self.verify(refresh_token, "refresh")
+        self.revoke(refresh_token, "refresh")
+        return self.issue(user_id)
+
+    def revoke(self, token, kind="access"):
+        max_age = self.access_ttl if kind == "access" else self.refresh_ttl
+        try:
+            payload, issued_at = self._serializers[kind].loads(token, max_age=max_age, return_timestamp=True)
+        except BadSignature:
+            return
+        self.revoked.add(payload["jti"], issued_at.timestamp() + max_age)
+
+    def _dump(self, kind, user_id):
+        return self._serializers[kind].dumps({"sub": user_id, "jti": uuid.uuid4().hex})